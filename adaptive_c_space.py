@@ -0,0 +1,180 @@
+import numpy as np
+from numpy import pi
+from c_space import arm_obstacles, as_obstacle_set, arm_geometry, arm_grid_axes, car_grid_axes, car_coords_collide
+from car_geometry import get_coords_batch, inflate_rectangles
+from continuous_collision import arm_reach, car_motion_bound
+
+# Adaptive (quadtree for the arm, octree for the car) configuration space.
+# The tree covers the same sample grid as the dense c-space functions, and a cell is a box of grid indices.
+# Every cell is classified with conservative tests on the robot at the cell's center configuration:
+#   - each part grown by the furthest any of its points can move inside the cell misses every obstacle -> FREE
+#   - some part shrunk by that distance still hits an obstacle (so every configuration in the cell does) -> BLOCKED
+#   - otherwise MIXED, and the cell is split in half along every axis that is longer than one sample.
+# A single-sample cell has no motion, so its test is the exact point test of the dense grid, which makes
+# to_dense() identical to arm_c_space/car_c_space_grid while only the cells along obstacle boundaries are ever
+# refined down to single samples. Cells are classified one tree level at a time, in batches.
+
+FREE, BLOCKED, MIXED = 0, 1, -1
+
+class AdaptiveCSpace:
+    # axes: one array of sample values per dimension. classify(centers (K, d), half_widths (K, d)) -> (K,) states
+    def __init__(self, axes, classify):
+        self.axes = [np.asarray(a, dtype=float) for a in axes]
+        self.shape = tuple(len(a) for a in self.axes)
+        self.classify = classify
+        self.cells_tested = 0
+        self.build()
+
+    @property
+    def ndim(self):
+        return len(self.axes)
+
+    def cell_bounds(self, lo, hi):
+        low = np.stack([a[l] for a, l in zip(self.axes, lo.T)], axis=1)
+        high = np.stack([a[h - 1] for a, h in zip(self.axes, hi.T)], axis=1)
+        return (low + high) / 2, (high - low) / 2
+
+    # Breadth-first subdivision. Every node stores its index box, state, and, for MIXED nodes, the split point
+    # per axis and the index of its first child; the 2^d children of a node are stored consecutively in
+    # bit order (bit k set = upper half along axis k). Halves that would be empty are kept as unreachable slots
+    def build(self):
+        d = self.ndim
+        lo, hi = [np.zeros((1, d), dtype=np.int64)], [np.array([self.shape], dtype=np.int64)]
+        state, mid, first_child = [], [], []
+        level_lo, level_hi, count = lo[0], hi[0], 0
+        codes = (np.arange(1 << d)[:, None] >> np.arange(d)) & 1 # (2^d, d) child bit patterns
+        while len(level_lo):
+            valid = (level_hi > level_lo).all(axis=1)
+            level_state = np.full(len(level_lo), FREE, dtype=np.int8)
+            if valid.any():
+                centers, half = self.cell_bounds(level_lo[valid], level_hi[valid])
+                level_state[valid] = self.classify(centers, half)
+                self.cells_tested += int(valid.sum())
+            single = ((level_hi - level_lo) == 1).all(axis=1)
+            level_state[single & (level_state == MIXED)] = BLOCKED # Point test: anything that is not free collides
+            split = level_hi - level_lo > 1
+            level_mid = np.where(split, (level_lo + level_hi) // 2, level_hi)
+            mixed = np.flatnonzero(level_state == MIXED)
+            level_first = np.full(len(level_lo), -1, dtype=np.int64)
+            level_first[mixed] = count + len(level_lo) + np.arange(len(mixed)) * (1 << d)
+            state.append(level_state)
+            mid.append(level_mid)
+            first_child.append(level_first)
+            count += len(level_lo)
+            # Children of every mixed cell: lower half [lo, mid) or upper half [mid, hi) along each axis
+            m_lo, m_hi, m_mid = level_lo[mixed][:, None], level_hi[mixed][:, None], level_mid[mixed][:, None]
+            level_lo = np.where(codes, m_mid, m_lo).reshape(-1, d)
+            level_hi = np.where(codes, m_hi, m_mid).reshape(-1, d)
+            if len(level_lo):
+                lo.append(level_lo)
+                hi.append(level_hi)
+        self.lo, self.hi = np.concatenate(lo), np.concatenate(hi)
+        self.state, self.mid = np.concatenate(state), np.concatenate(mid)
+        self.first_child = np.concatenate(first_child)
+
+    def __len__(self):
+        return len(self.state)
+
+    # Leaves that cover part of the grid: (lo, hi, state)
+    def leaves(self):
+        keep = (self.state != MIXED) & (self.hi > self.lo).all(axis=1)
+        return self.lo[keep], self.hi[keep], self.state[keep]
+
+    # Index of the nearest sample along every axis for (P, d) configurations
+    def nearest_indices(self, points):
+        points = np.asarray(points, dtype=float).reshape(-1, self.ndim)
+        indices = []
+        for a, v in zip(self.axes, points.T):
+            i = np.clip(np.searchsorted(a, v), 1, max(len(a) - 1, 1))
+            indices.append(np.where(np.abs(v - a[i - 1]) <= np.abs(a[np.minimum(i, len(a) - 1)] - v), i - 1, i))
+        return np.clip(np.stack(indices, axis=1), 0, np.array(self.shape) - 1)
+
+    # State of the grid samples with the given (P, d) indices
+    def lookup(self, indices):
+        indices = np.asarray(indices, dtype=np.int64).reshape(-1, self.ndim)
+        node = np.zeros(len(indices), dtype=np.int64)
+        bits = 1 << np.arange(self.ndim)
+        while True:
+            mixed = np.flatnonzero(self.state[node] == MIXED)
+            if not len(mixed): break
+            n = node[mixed]
+            node[mixed] = self.first_child[n] + ((indices[mixed] >= self.mid[n]) * bits).sum(axis=1)
+        return self.state[node]
+
+    # Point-membership queries: True where the configuration (snapped to the nearest grid sample) collides
+    def collides(self, points):
+        return self.lookup(self.nearest_indices(points)) == BLOCKED
+
+    # Dense occupancy grid in the layout of arm_c_space / car_c_space_grid, 1 = collision
+    def to_dense(self):
+        grid = np.zeros(self.shape, dtype=np.uint8)
+        lo, hi, state = self.leaves()
+        blocked = state == BLOCKED
+        lo, hi = lo[blocked], hi[blocked]
+        single = ((hi - lo) == 1).all(axis=1)
+        grid[tuple(lo[single].T)] = 1
+        for l, h in zip(lo[~single], hi[~single]):
+            grid[tuple(slice(a, b) for a, b in zip(l, h))] = 1
+        return grid
+
+    def stats(self):
+        lo, hi, state = self.leaves()
+        return {'nodes': len(self), 'leaves': len(state), 'cells_tested': self.cells_tested,
+                'dense_samples': int(np.prod(self.shape)), 'finest_leaves': int(((hi - lo) == 1).all(axis=1).sum())}
+
+# Shared cell test for robots made of circles and rectangles: parts at the cell centers plus, per part, the
+# furthest any of its points can move inside the cell (margins). min_half_size is the smallest half-width of any
+# rectangle, beyond which a shrunk rectangle is empty and cannot prove anything
+def classify_parts(obstacles, centers, radii, center_margins, rects, rect_margins, min_half_size):
+    n = len(centers)
+    grown = obstacles.circles_collide(centers.reshape(-1, 2), (radii + center_margins).ravel()).reshape(n, -1).any(axis=1)
+    grown |= obstacles.polygons_collide(inflate_rectangles(rects.reshape(-1, 4, 2), rect_margins.ravel())).reshape(n, -1).any(axis=1)
+    state = np.where(grown, MIXED, FREE).astype(np.int8)
+    blocked = np.zeros(n, dtype=bool)
+    shrink = (center_margins < radii) & grown[:, None]
+    owner = np.nonzero(shrink)[0]
+    blocked[owner[obstacles.circles_collide(centers[shrink], (radii - center_margins)[shrink])]] = True
+    shrink = (rect_margins < min_half_size) & grown[:, None]
+    owner = np.nonzero(shrink)[0]
+    blocked[owner[obstacles.polygons_collide(inflate_rectangles(rects[shrink], -rect_margins[shrink]))]] = True
+    state[grown & blocked] = BLOCKED
+    return state
+
+# Adaptive c-space of the two-link arm over the same theta1 x theta2 grid as arm_c_space
+def arm_adaptive_c_space(arm, resolution=100, theta1_range=(-pi, pi), theta2_range=(-pi, pi), obstacles=None):
+    classify = arm_cell_classifier(arm, arm_obstacles(arm, obstacles))
+    return AdaptiveCSpace(arm_grid_axes(resolution, theta1_range, theta2_range), classify)
+
+# Cell test for the two-link arm over (theta1, theta2) cells.
+# Joint1 never moves, joint2 and link 1 only move with theta1, joint3 and link 2 with both angles
+def arm_cell_classifier(arm, obstacles):
+    link1, joint2_reach, link2 = arm_reach(arm)
+    def classify(centers, half):
+        joints, rects = arm_geometry(arm, centers[:, 0], centers[:, 1])
+        m1 = half[:, 0] * link1
+        m2 = half[:, 0] * joint2_reach + half[:, 1] * link2
+        joint_margins = np.stack([np.zeros_like(m1), m1, m2], axis=1)
+        radii = np.full(joint_margins.shape, float(arm.rad))
+        return classify_parts(obstacles, joints, radii, joint_margins, rects, np.stack([m1, m2], axis=1), arm.rwid / 2)
+    return classify
+
+# Adaptive c-space of the car over the same x * y * angle grid as car_c_space_grid (angles in degrees)
+def car_adaptive_c_space(width, height, obstacles, resolution=50, x_range=(0, 2), y_range=(0, 2),
+                         angle_range=(0, 360), bounds=(0, 2, 0, 2)):
+    classify = car_cell_classifier(width, height, as_obstacle_set(obstacles), bounds)
+    return AdaptiveCSpace(car_grid_axes(resolution, x_range, y_range, angle_range), classify)
+
+# Cell test for the car over (x, y, angle) cells. Leaving the workspace counts as collision; a cell is blocked by
+# the bounds when a corner is further outside than it can move within the cell
+def car_cell_classifier(width, height, obstacles, bounds=(0, 2, 0, 2)):
+    def classify(centers, half):
+        coords = get_coords_batch(centers[:, 0], centers[:, 1], centers[:, 2], width, height)
+        margin = car_motion_bound(centers, centers + half, width, height)
+        grown = car_coords_collide(inflate_rectangles(coords, margin), obstacles, bounds)
+        m = margin[:, None]
+        blocked = ((coords[..., 0] < bounds[0] - m) | (coords[..., 0] > bounds[1] + m) |
+                   (coords[..., 1] < bounds[2] - m) | (coords[..., 1] > bounds[3] + m)).any(axis=1)
+        shrink = np.flatnonzero(grown & (margin < min(width, height) / 2))
+        blocked[shrink] |= obstacles.polygons_collide(inflate_rectangles(coords[shrink], -margin[shrink]))
+        return np.where(grown, np.where(blocked, BLOCKED, MIXED), FREE).astype(np.int8)
+    return classify
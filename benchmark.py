@@ -0,0 +1,174 @@
+import argparse
+import csv
+import json
+import statistics
+import sys
+import time
+import matplotlib
+matplotlib.use('Agg') # Headless: nothing here should ever open a window
+import matplotlib.pyplot as plt
+import matplotlib.patches as patches
+import numpy as np
+from create_scene import generate_polygons
+from scene_store import PolygonStore
+from collision_checking import SAT_Collides, circle_poly_collides, check_all_boxes, collides, find_collisions
+from broad_phase import SweepAndPrune
+from rigid_body import check_car
+from planar_arm import Arm_Controller
+from c_space import arm_c_space
+
+# Headless benchmark suite for the collision and c-space hot paths.
+# Every benchmark runs against generated scenes for each (obstacle count, vertex count) combination it supports,
+# and the median time per call is written as JSON and/or CSV. A stored baseline can be compared against, in
+# which case any benchmark slower than baseline * (1 + threshold) is reported and the exit status is 1.
+#
+#   python benchmark.py --sizes 10 1000 100000 --vertices 4 50 --json results.json
+#   python benchmark.py --baseline results.json --threshold 0.2
+
+# Seeded scene of uniformly placed polygons whose size shrinks with the obstacle count so the area they cover
+# stays about the same
+def make_scene(obstacles, vertices, seed=0):
+    r_max = min(0.2, 0.6 / np.sqrt(obstacles))
+    chunks = list(generate_polygons(obstacles, vertices, vertices, r_max / 2, r_max, seed=seed))
+    return PolygonStore.from_polygons([p for chunk in chunks for p in chunk])
+
+# The arm benchmarks' version of a scene: without the obstacles that come within reach of the base joint, link 1
+# or joint 2 (the disc of radius 3 * rad + rlen1 around the base). In large scenes those parts otherwise collide
+# in every direction, and the arm benchmarks would time arm_c_space_grid's early exits instead of the link 2
+# checks that scale with the obstacle count. The rest of the scene stays uniform
+def arm_scene(scene):
+    arm = Arm_Controller(0, 0, None)
+    gap = np.maximum(np.maximum(scene.boxes[:, 0] - arm.joint1, np.asarray(arm.joint1) - scene.boxes[:, 1]), 0)
+    return scene.subset(np.flatnonzero(np.hypot(gap[:, 0], gap[:, 1]) > 3 * arm.rad + arm.rlen1))
+
+# Fraction of the arm's (theta1, theta2) c-space the arm's version of the scene blocks, on a coarse grid
+def blocked_fraction(scene, resolution=50):
+    return float(arm_c_space(Arm_Controller(0, 0, None, arm_scene(scene)), resolution).mean())
+
+# Each benchmark takes a scene and returns a zero-argument callable to time.
+# Pair-level checks only depend on the vertex count, so they ignore the obstacle count and run once per size
+
+def bench_sat(scene):
+    return lambda: SAT_Collides(scene[0], scene[1])
+
+def bench_circle_poly(scene):
+    center = scene.boxes[0].mean(axis=0)
+    return lambda: circle_poly_collides(center, 0.05, scene[0])
+
+def bench_check_all_boxes(scene):
+    return lambda: check_all_boxes(scene)
+
+def bench_find_collisions(scene):
+    return lambda: find_collisions(scene)
+
+def bench_collides(scene):
+    return lambda: collides(scene[0], scene[1])
+
+def bench_check_car(scene):
+    car = patches.Rectangle((0.9, 0.9), 0.2, 0.1, angle=30)
+    index = SweepAndPrune(scene.boxes)
+    return lambda: check_car(car, scene, index)
+
+def bench_check_arm(scene):
+    arm = Arm_Controller(0.3, 1.2, None, arm_scene(scene))
+    return lambda: arm.check_arm_collisions()
+
+def bench_create_c_space(scene):
+    arm = Arm_Controller(0, 0, None, arm_scene(scene))
+    def run():
+        arm.create_c_space()
+        plt.close('all')
+    return run
+
+BENCHMARKS = {
+    'SAT_Collides': (bench_sat, False),
+    'circle_poly_collides': (bench_circle_poly, False),
+    'check_all_boxes': (bench_check_all_boxes, True),
+    'find_collisions': (bench_find_collisions, True),
+    'collides': (bench_collides, False),
+    'check_car': (bench_check_car, True),
+    'check_arm_collisions': (bench_check_arm, True),
+    'create_c_space': (bench_create_c_space, True),
+}
+
+# Median seconds per call: loops are grown until one measurement takes at least min_time, then repeated
+def time_call(fn, repeat=5, min_time=0.05):
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops): fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or loops >= 1 << 20: break
+        loops *= 10
+    samples = [elapsed / loops]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops): fn()
+        samples.append((time.perf_counter() - start) / loops)
+    return statistics.median(samples), loops
+
+def run(names, sizes, vertices, repeat=5, min_time=0.05, log=print):
+    results = []
+    for v in vertices:
+        for n in sizes:
+            scene = None
+            for name in names:
+                bench, scales = BENCHMARKS[name]
+                if not scales and n != min(sizes):
+                    continue
+                if scene is None:
+                    scene = make_scene(max(n, 2), v)
+                    blocked = blocked_fraction(scene)
+                seconds, loops = time_call(bench(scene), repeat, min_time)
+                result = {'benchmark': name, 'obstacles': n if scales else 2, 'vertices': v, 'seconds': seconds, 'loops': loops,
+                          'blocked': blocked}
+                results.append(result)
+                log(f"{name:24s} obstacles={result['obstacles']:<7d} vertices={v:<3d} {seconds*1e3:12.4f} ms  blocked={blocked:.3f}")
+    return results
+
+def key(result):
+    return (result['benchmark'], result['obstacles'], result['vertices'])
+
+# Benchmarks that got slower than baseline * (1 + threshold), as (result, baseline seconds) pairs
+def compare(results, baseline, threshold):
+    base = {key(r): r['seconds'] for r in baseline}
+    return [(r, base[key(r)]) for r in results if key(r) in base and r['seconds'] > base[key(r)] * (1 + threshold)]
+
+def write_csv(results, filename):
+    with open(filename, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=['benchmark', 'obstacles', 'vertices', 'seconds', 'loops', 'blocked'])
+        writer.writeheader()
+        writer.writerows(results)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless benchmarks for the collision and c-space code")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000, 100000], help="obstacle counts")
+    parser.add_argument('--vertices', type=int, nargs='+', default=[4, 12, 50], help="vertices per obstacle")
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), default=list(BENCHMARKS), help="benchmarks to run")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.05, help="minimum seconds per measurement")
+    parser.add_argument('--json', help="write results as JSON")
+    parser.add_argument('--csv', help="write results as CSV")
+    parser.add_argument('--baseline', help="JSON results to compare against")
+    parser.add_argument('--threshold', type=float, default=0.25, help="allowed slowdown vs the baseline (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    results = run(args.only, sorted(args.sizes), args.vertices, args.repeat, args.min_time)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.csv:
+        write_csv(results, args.csv)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for result, seconds in regressions:
+            print(f"REGRESSION {result['benchmark']} obstacles={result['obstacles']} vertices={result['vertices']}: "
+                  f"{seconds*1e3:.4f} ms -> {result['seconds']*1e3:.4f} ms")
+        if regressions:
+            return 1
+        print("No regressions against baseline")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,107 @@
+import numpy as np
+import instrumentation
+
+# Broad-phase collision detection: a sweep-and-prune index over axis-aligned bounding boxes.
+# Boxes use the same [[min_x, min_y], [max_x, max_y]] layout as bound_polygons/bound_circle,
+# and touching boxes count as overlapping, just like check_box_collision.
+
+# Expands the index ranges [starts[k], ends[k]) into flat (owner, index) arrays without a Python loop
+def expand_ranges(starts, ends):
+    counts = np.maximum(ends - starts, 0)
+    owners = np.repeat(np.arange(len(starts)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return owners, np.repeat(starts, counts) + offsets
+
+# Vectorized check_box_collision between boxes1[k] and boxes2[k]
+def boxes_overlap(boxes1, boxes2):
+    return ~((boxes1[:, 1, 0] < boxes2[:, 0, 0]) |
+             (boxes1[:, 0, 0] > boxes2[:, 1, 0]) |
+             (boxes1[:, 1, 1] < boxes2[:, 0, 1]) |
+             (boxes1[:, 0, 1] > boxes2[:, 1, 1]))
+
+# Vectorized distance between boxes1[k] and boxes2[k] (0 when they overlap), a lower bound on the distance
+# between any two shapes inside them
+def box_gaps(boxes1, boxes2):
+    gap = np.maximum(np.maximum(boxes2[:, 0] - boxes1[:, 1], boxes1[:, 0] - boxes2[:, 1]), 0)
+    return np.hypot(gap[:, 0], gap[:, 1])
+
+# Built once from an obstacle set, then queried with one box or a batch of boxes.
+# Boxes are kept sorted by min x, so a query only looks at the slice of boxes whose min x lies in
+# [query min x - widest box, query max x] instead of scanning every obstacle
+class SweepAndPrune:
+    def __init__(self, boxes):
+        boxes = np.asarray(boxes, dtype=float).reshape(-1, 2, 2)
+        self.order = np.argsort(boxes[:, 0, 0], kind='stable')
+        self.boxes = boxes[self.order]
+        self.min_x = self.boxes[:, 0, 0]
+        self.max_width = (self.boxes[:, 1, 0] - self.boxes[:, 0, 0]).max() if len(boxes) else 0.0
+
+    @classmethod
+    def from_polygons(cls, polygons):
+        return cls([np.array([np.min(p, axis=0), np.max(p, axis=0)]) for p in polygons])
+
+    def __len__(self):
+        return len(self.boxes)
+
+    # Replaces the boxes of the obstacles with the given (distinct) indices. Only those k boxes are re-sorted: they
+    # are taken out of the sorted arrays, sorted among themselves and merged back in at their searchsorted
+    # positions, which costs O(n + k log n) per update instead of re-sorting all n boxes
+    def update(self, indices, boxes):
+        indices = np.asarray(indices, dtype=np.int64)
+        boxes = np.asarray(boxes, dtype=float).reshape(-1, 2, 2)
+        changed = np.zeros(len(self.order), dtype=bool)
+        changed[indices] = True
+        keep = ~changed[self.order]
+        order, kept = self.order[keep], self.boxes[keep]
+        new = np.argsort(boxes[:, 0, 0], kind='stable')
+        at = np.searchsorted(kept[:, 0, 0], boxes[new, 0, 0], side='right')
+        self.order = np.insert(order, at, indices[new])
+        self.boxes = np.insert(kept, at, boxes[new], axis=0)
+        self.min_x = self.boxes[:, 0, 0]
+        self.max_width = (self.boxes[:, 1, 0] - self.boxes[:, 0, 0]).max() if len(self.boxes) else 0.0
+
+    # Returns (query index, obstacle index) arrays for every overlapping (query box, obstacle box) pair.
+    # Candidate ranges are expanded for a group of queries at a time, about max_candidates pairs per group, so memory
+    # stays bounded when many queries each span a wide slice of a large scene
+    def query_batch(self, boxes, max_candidates=1 << 20):
+        started = instrumentation.start()
+        boxes = np.asarray(boxes, dtype=float).reshape(-1, 2, 2)
+        starts = np.searchsorted(self.min_x, boxes[:, 0, 0] - self.max_width, side='left')
+        ends = np.searchsorted(self.min_x, boxes[:, 1, 0], side='right')
+        cuts = np.flatnonzero(np.diff(np.cumsum(np.maximum(ends - starts, 0)) // max_candidates)) + 1
+        queries, obstacles, tested = [], [], 0
+        for group in np.split(np.arange(len(boxes)), cuts):
+            query, candidate = expand_ranges(starts[group], ends[group])
+            query = group[query]
+            hits = boxes_overlap(boxes[query], self.boxes[candidate])
+            tested += len(candidate)
+            queries.append(query[hits])
+            obstacles.append(self.order[candidate[hits]])
+        query, obstacle = np.concatenate(queries), np.concatenate(obstacles)
+        if instrumentation.enabled:
+            instrumentation.count('aabb_tests', tested)
+            instrumentation.count('broad_phase_hits', len(query))
+        instrumentation.stop('broad_phase', started)
+        return query, obstacle
+
+    # Returns the sorted indices of the obstacles whose boxes overlap a single box
+    def query(self, box):
+        return np.sort(self.query_batch([box])[1])
+
+    # Returns every overlapping pair (i, j), i < j, inside the indexed set itself, in the same order
+    # as a nested loop over i then j would find them
+    def self_pairs(self):
+        started = instrumentation.start()
+        n = len(self.boxes)
+        starts = np.arange(1, n + 1)
+        ends = np.searchsorted(self.min_x, self.boxes[:, 1, 0], side='right')
+        a, b = expand_ranges(starts, ends)
+        hits = boxes_overlap(self.boxes[a], self.boxes[b])
+        if instrumentation.enabled:
+            instrumentation.count('aabb_tests', len(a))
+            instrumentation.count('broad_phase_hits', hits.sum())
+        instrumentation.stop('broad_phase', started)
+        i, j = self.order[a[hits]], self.order[b[hits]]
+        i, j = np.minimum(i, j), np.maximum(i, j)
+        sort = np.lexsort((j, i))
+        return i[sort], j[sort]
@@ -0,0 +1,160 @@
+import numpy as np
+from numpy import pi
+from collision_checking import bound_polygons, pad_polygons, SAT_Collides_batch, circle_poly_collides_batch
+from broad_phase import SweepAndPrune
+from scene_store import PolygonStore
+from car_geometry import get_coords_batch
+
+# Vectorized configuration-space engine.
+# Forward kinematics are evaluated for whole arrays of configurations and every robot part is tested
+# against the obstacles with the batched broad-phase + narrow-phase functions, so no robot state is mutated.
+
+# Obstacles prepared once for batched queries: broad-phase index plus the padded vertex array
+class ObstacleSet:
+    def __init__(self, polygons, index=None):
+        self.polygons = polygons
+        self.index = SweepAndPrune(bound_polygons(polygons)) if index is None else index
+        self.padded = pad_polygons(polygons) if len(polygons) else np.empty((0, 1, 2))
+        # A PolygonStore already holds the obstacles' normals and extents, so the narrow phase skips recomputing them
+        self.geometry = polygons.padded_geometry() if isinstance(polygons, PolygonStore) and len(polygons) else None
+
+    def __len__(self):
+        return len(self.padded)
+
+    # For each circle, does it hit any obstacle? centers (N, 2), radius scalar or (N,).
+    # Like polygons_collide, it runs chunk_size queries at a time so their candidate pairs stay bounded in memory
+    def circles_collide(self, centers, radius, chunk_size=1024):
+        centers = np.asarray(centers, dtype=float).reshape(-1, 2)
+        radius = np.broadcast_to(np.asarray(radius, dtype=float), (len(centers),))
+        result = np.zeros(len(centers), dtype=bool)
+        for start in range(0, len(centers), chunk_size):
+            c, r = centers[start:start+chunk_size], radius[start:start+chunk_size]
+            query, obstacle = self.index.query_batch(np.stack([c - r[:, None], c + r[:, None]], axis=1))
+            hits = circle_poly_collides_batch(c[query], r[query], self.padded[obstacle])
+            result[start + query[hits]] = True
+        return result
+
+    # For each convex polygon in a padded (N, V, 2) array, does it hit any obstacle?
+    def polygons_collide(self, polygons, chunk_size=1024):
+        polygons = np.asarray(polygons, dtype=float)
+        result = np.zeros(len(polygons), dtype=bool)
+        for start in range(0, len(polygons), chunk_size):
+            chunk = polygons[start:start+chunk_size]
+            query, obstacle = self.index.query_batch(np.stack([chunk.min(axis=1), chunk.max(axis=1)], axis=1))
+            geometry = None if self.geometry is None else (self.geometry[0][obstacle], self.geometry[1][obstacle])
+            hits = SAT_Collides_batch(chunk[query], self.padded[obstacle], geometry2=geometry)
+            result[start + query[hits]] = True
+        return result
+
+def as_obstacle_set(obstacles):
+    return obstacles if isinstance(obstacles, ObstacleSet) else ObstacleSet(obstacles)
+
+# The obstacles to test an arm against: the given set, or the arm's own set, built once by set_arm_obs
+def arm_obstacles(arm, obstacles=None):
+    return as_obstacle_set(obstacles) if obstacles is not None else arm.obs_set
+
+# Arm geometry for arrays of (theta1, theta2): joint centers (N, 3, 2) and link rectangles (N, 2, 4, 2).
+# Uses the controller's own kinematics helpers, which broadcast over arrays
+def arm_geometry(arm, theta1, theta2):
+    theta1, theta2 = np.broadcast_arrays(np.asarray(theta1, dtype=float).ravel(), np.asarray(theta2, dtype=float).ravel())
+    joint1 = np.broadcast_to(np.asarray(arm.joint1, dtype=float), (len(theta1), 2))
+    anchor1 = np.stack(arm.compute_rect_anchor(theta1, arm.joint1, arm.rad, arm.rwid), axis=-1)
+    joint2 = np.stack(arm.compute_circle_center(theta1, arm.joint1, arm.rad, arm.rlen1), axis=-1)
+    anchor2 = np.stack(arm.compute_rect_anchor(theta2, joint2.T, arm.rad, arm.rwid), axis=-1)
+    joint3 = np.stack(arm.compute_circle_center(theta2, joint2.T, arm.rad, arm.rlen2), axis=-1)
+    rect1 = arm.get_rect_vertices_batch(anchor1, arm.rwid, arm.rlen1, theta1 - pi/2)
+    rect2 = arm.get_rect_vertices_batch(anchor2, arm.rwid, arm.rlen2, theta2 - pi/2)
+    return np.stack([joint1, joint2, joint3], axis=1), np.stack([rect1, rect2], axis=1)
+
+# Per-part collisions for arrays of configurations: (N, 5) booleans in check_arm_collisions order
+# (joint1, joint2, joint3, rect1, rect2)
+def arm_collisions(arm, theta1, theta2, obstacles=None):
+    obstacles = arm_obstacles(arm, obstacles)
+    joints, rects = arm_geometry(arm, theta1, theta2)
+    n = len(joints)
+    joint_coll = obstacles.circles_collide(joints.reshape(-1, 2), arm.rad).reshape(n, 3)
+    rect_coll = obstacles.polygons_collide(rects.reshape(-1, 4, 2)).reshape(n, 2)
+    return np.concatenate([joint_coll, rect_coll], axis=1)
+
+# Grid axes for a c-space sweep; resolution is one int for both axes or a (n1, n2) pair
+def arm_grid_axes(resolution=100, theta1_range=(-pi, pi), theta2_range=(-pi, pi)):
+    n1, n2 = (resolution, resolution) if np.isscalar(resolution) else resolution
+    return np.linspace(*theta1_range, n1), np.linspace(*theta2_range, n2)
+
+# Occupancy grid of the arm over a theta1 x theta2 grid (grid[i, j] is theta1s[i], theta2s[j]), 1 = collision.
+# Joint1 is fixed and joint2/rect1 only depend on theta1, so those are tested once per row and only
+# joint3/rect2 are tested on the full grid, in chunks of rows to bound memory
+def arm_c_space(arm, resolution=100, theta1_range=(-pi, pi), theta2_range=(-pi, pi), obstacles=None, chunk_size=1 << 16):
+    obstacles = arm_obstacles(arm, obstacles)
+    theta1s, theta2s = arm_grid_axes(resolution, theta1_range, theta2_range)
+    return arm_c_space_grid(arm, theta1s, theta2s, obstacles, chunk_size)
+
+def arm_c_space_grid(arm, theta1s, theta2s, obstacles, chunk_size=1 << 16):
+    grid = np.zeros((len(theta1s), len(theta2s)), dtype=np.uint8)
+    joints, rects = arm_geometry(arm, theta1s, theta2s[:1])
+    if obstacles.circles_collide(joints[:1, 0], arm.rad)[0]:
+        grid[:] = 1
+        return grid
+    row_blocked = obstacles.circles_collide(joints[:, 1], arm.rad) | obstacles.polygons_collide(rects[:, 0])
+    grid[row_blocked] = 1
+    rows = np.flatnonzero(~row_blocked)
+    rows_per_chunk = max(1, chunk_size // max(len(theta2s), 1))
+    for start in range(0, len(rows), rows_per_chunk):
+        chunk = rows[start:start+rows_per_chunk]
+        t1, t2 = np.meshgrid(theta1s[chunk], theta2s, indexing='ij')
+        joints, rects = arm_geometry(arm, t1, t2)
+        blocked = obstacles.circles_collide(joints[:, 2], arm.rad) | obstacles.polygons_collide(rects[:, 1])
+        grid[chunk] = blocked.reshape(len(chunk), len(theta2s))
+    return grid
+
+# Car collisions for arrays of poses (angle in degrees): True if the car hits an obstacle or leaves the
+# (x_min, x_max, y_min, y_max) workspace, i.e. not (check_car and check_boundary)
+def car_collisions(x, y, angle, width, height, obstacles, bounds=(0, 2, 0, 2)):
+    return car_coords_collide(get_coords_batch(x, y, angle, width, height), obstacles, bounds)
+
+# Same test for car corners that are already computed, (N, 4, 2)
+def car_coords_collide(coords, obstacles, bounds=(0, 2, 0, 2)):
+    obstacles = as_obstacle_set(obstacles)
+    outside = ((coords[..., 0] < bounds[0]) | (coords[..., 0] > bounds[1]) |
+               (coords[..., 1] < bounds[2]) | (coords[..., 1] > bounds[3])).any(axis=1)
+    blocked = outside.copy()
+    blocked[~outside] = obstacles.polygons_collide(coords[~outside])
+    return blocked
+
+# Draws n collision-free car poses (x, y, angle in degrees) uniformly from the given ranges: candidates are drawn
+# in batches, their corners computed with array math and filtered with the batched boundary and obstacle tests.
+# Batches grow with the observed acceptance rate, up to 16 * batch_size to bound memory.
+# Raises RuntimeError if max_samples candidates yield too few poses.
+# Returns an (n, 3) array
+def sample_free_car_poses(n, width, height, obstacles, x_range=(0, 2), y_range=(0, 2), angle_range=(0, 360),
+                          bounds=(0, 2, 0, 2), seed=None, batch_size=4096, max_samples=10**8):
+    obstacles = as_obstacle_set(obstacles)
+    rng = np.random.default_rng(seed)
+    low, high = np.array([x_range[0], y_range[0], angle_range[0]]), np.array([x_range[1], y_range[1], angle_range[1]])
+    found, count, drawn, accepted = [], 0, 0, 0
+    while count < n:
+        if drawn >= max_samples:
+            raise RuntimeError(f"only {count} of {n} free car poses found in {drawn} samples")
+        rate = max(accepted / drawn, 1e-3) if drawn else 1.0
+        size = int(min(max(batch_size, 1.2 * (n - count) / rate), 16 * batch_size, max_samples - drawn))
+        poses = rng.uniform(low, high, size=(size, 3))
+        free = poses[~car_collisions(poses[:, 0], poses[:, 1], poses[:, 2], width, height, obstacles, bounds)]
+        drawn, accepted = drawn + size, accepted + len(free)
+        found.append(free[:n - count])
+        count += len(found[-1])
+    return np.concatenate(found)
+
+# Grid axes for a car c-space sweep; resolution is one int for every axis or an (nx, ny, nangle) triple
+def car_grid_axes(resolution=50, x_range=(0, 2), y_range=(0, 2), angle_range=(0, 360)):
+    nx, ny, na = (resolution,) * 3 if np.isscalar(resolution) else resolution
+    return np.linspace(*x_range, nx), np.linspace(*y_range, ny), np.linspace(*angle_range, na, endpoint=False)
+
+# Occupancy grid of the car over an x * y * angle grid (grid[i, j, k] is xs[i], ys[j], angles[k]), 1 = collision
+def car_c_space_grid(xs, ys, angles, width, height, obstacles, bounds=(0, 2, 0, 2), chunk_size=1 << 16):
+    obstacles = as_obstacle_set(obstacles)
+    grid = np.zeros((len(xs), len(ys), len(angles)), dtype=np.uint8)
+    rows_per_chunk = max(1, chunk_size // max(len(ys) * len(angles), 1))
+    for start in range(0, len(xs), rows_per_chunk):
+        x, y, a = np.meshgrid(xs[start:start+rows_per_chunk], ys, angles, indexing='ij')
+        grid[start:start+rows_per_chunk] = car_collisions(x, y, a, width, height, obstacles, bounds).reshape(x.shape)
+    return grid
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+from collections import Counter
+import numpy as np
+from c_space import ObstacleSet, arm_c_space_grid, arm_collisions, car_c_space_grid, car_collisions
+from tiled_c_space import job_arm
+from adaptive_c_space import AdaptiveCSpace, arm_cell_classifier, car_cell_classifier
+from scene_store import PolygonStore, obstacle_digest, obstacle_digests
+
+# Persistent, content-addressed cache of occupancy grids.
+# A grid is identified by the job (robot geometry and sampling axes, see tiled_c_space.arm_job/car_job) and by the
+# multiset of obstacles, each hashed by its vertices, so neither obstacle order nor file names matter. Grids are
+# stored bit-packed along the last axis as <cache_dir>/cspace-<key>.npy next to a .json describing them and an
+# .obstacles.npz PolygonStore of the obstacles, and a hit is memory-mapped instead of read.
+# An occupancy grid is the union of the grids of the single obstacles, so on a miss the cached grid for the same
+# job whose obstacles differ the least is updated instead of recomputed: added obstacles are OR-ed in, and only
+# the cells blocked by a removed obstacle are re-checked against the remaining ones.
+
+# Occupancy grid stored as packed bits, 1 = collision
+class CSpaceMap:
+    def __init__(self, packed, shape):
+        self.packed = packed
+        self.shape = tuple(shape)
+
+    @classmethod
+    def from_dense(cls, grid):
+        return cls(np.packbits(np.asarray(grid, dtype=bool), axis=-1), grid.shape)
+
+    def to_dense(self):
+        return np.unpackbits(np.asarray(self.packed), axis=-1, count=self.shape[-1])
+
+    # States of the samples with the given (P, d) grid indices, read straight from the packed bits
+    def lookup(self, indices):
+        indices = np.asarray(indices, dtype=np.int64).reshape(-1, len(self.shape))
+        byte = self.packed[tuple(indices[:, :-1].T) + (indices[:, -1] >> 3,)]
+        return (byte >> (7 - (indices[:, -1] & 7))) & 1
+
+def job_digest(job):
+    return hashlib.sha256(json.dumps(job, sort_keys=True).encode()).hexdigest()
+
+def cache_key(job, digests):
+    return hashlib.sha256((job_digest(job) + ''.join(digests)).encode()).hexdigest()[:32]
+
+def job_axes(job):
+    return [np.asarray(a, dtype=float) for a in job['axes']]
+
+# Full occupancy grid of a job for some obstacles. adaptive=True goes through the adaptive c-space, which is much
+# cheaper when the obstacles only block a small part of the grid (e.g. a handful of added or removed obstacles)
+def job_grid(job, obstacles, adaptive=False):
+    axes, obstacles = job_axes(job), ObstacleSet(obstacles)
+    g = job['geometry']
+    if adaptive:
+        if job['kind'] == 'arm':
+            classify = arm_cell_classifier(job_arm(job), obstacles)
+        else:
+            classify = car_cell_classifier(g['width'], g['height'], obstacles, tuple(g['bounds']))
+        return AdaptiveCSpace(axes, classify).to_dense()
+    if job['kind'] == 'arm':
+        return arm_c_space_grid(job_arm(job), axes[0], axes[1], obstacles)
+    return car_c_space_grid(*axes, g['width'], g['height'], obstacles, tuple(g['bounds']))
+
+# Collision flags of the samples with the given (P, d) grid indices, in chunks to bound memory
+def job_samples(job, obstacles, indices, chunk_size=1 << 14):
+    axes, obstacles = job_axes(job), ObstacleSet(obstacles)
+    arm = job_arm(job) if job['kind'] == 'arm' else None
+    g = job['geometry']
+    result = np.zeros(len(indices), dtype=bool)
+    for start in range(0, len(indices), chunk_size):
+        values = [a[i] for a, i in zip(axes, indices[start:start+chunk_size].T)]
+        if arm is not None:
+            result[start:start+chunk_size] = arm_collisions(arm, values[0], values[1], obstacles).any(axis=1)
+        else:
+            result[start:start+chunk_size] = car_collisions(*values, g['width'], g['height'], obstacles, tuple(g['bounds']))
+    return result
+
+class CSpaceCache:
+    def __init__(self, cache_dir='.cspace_cache'):
+        self.cache_dir = cache_dir
+
+    def path(self, key, ext):
+        return os.path.join(self.cache_dir, f"cspace-{key}{ext}")
+
+    def load(self, key):
+        with open(self.path(key, '.json')) as f:
+            meta = json.load(f)
+        return CSpaceMap(np.load(self.path(key, '.npy'), mmap_mode='r'), meta['shape'])
+
+    # Writes the grid, its obstacles and its description; files are renamed into place and the description goes
+    # last, so readers never see a partial entry
+    def store(self, key, job, obstacles, digests, grid):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        PolygonStore.from_polygons(obstacles).save(self.path(key, '.tmp.npz'))
+        os.replace(self.path(key, '.tmp.npz'), self.path(key, '.obstacles.npz'))
+        packed = CSpaceMap.from_dense(grid).packed
+        with open(self.path(key, '.tmp.npy'), 'wb') as f:
+            np.save(f, packed, allow_pickle=False)
+        os.replace(self.path(key, '.tmp.npy'), self.path(key, '.npy'))
+        meta = {'job_digest': job_digest(job), 'obstacles': digests, 'shape': list(grid.shape)}
+        with open(self.path(key, '.tmp.json'), 'w') as f:
+            json.dump(meta, f)
+        os.replace(self.path(key, '.tmp.json'), self.path(key, '.json'))
+
+    # Cached entry for the same job with the fewest obstacles added + removed: (key, added, removed) or None
+    def closest(self, job, digests):
+        if not os.path.isdir(self.cache_dir):
+            return None
+        wanted, target, best = job_digest(job), Counter(digests), None
+        for name in os.listdir(self.cache_dir):
+            if not (name.startswith('cspace-') and name.endswith('.json')) or name.endswith('.tmp.json'):
+                continue
+            with open(os.path.join(self.cache_dir, name)) as f:
+                meta = json.load(f)
+            if meta['job_digest'] != wanted:
+                continue
+            cached = Counter(meta['obstacles'])
+            added, removed = target - cached, cached - target
+            cost = sum(added.values()) + sum(removed.values())
+            if best is None or cost < best[0]:
+                best = (cost, name[len('cspace-'):-len('.json')], added, removed)
+        return None if best is None else best[1:]
+
+    # Occupancy map of a job for these obstacles: loaded on a hit, updated from the closest cached entry when
+    # fewer obstacles changed than there are obstacles, computed from scratch otherwise
+    def get(self, job, obstacles, incremental=True):
+        obstacles = list(obstacles)
+        digests = obstacle_digests(obstacles)
+        key = cache_key(job, digests)
+        if os.path.exists(self.path(key, '.json')):
+            return self.load(key)
+        base = self.closest(job, digests) if incremental else None
+        if base is not None and sum(base[1].values()) + sum(base[2].values()) < max(len(obstacles), 1):
+            old_obstacles = PolygonStore.load(self.path(base[0], '.obstacles.npz'))
+            grid = update_grid(job, self.load(base[0]).to_dense(), obstacles,
+                               [o for o in obstacles if obstacle_digest(o) in base[1]],
+                               [o for o in old_obstacles if obstacle_digest(o) in base[2]])
+        else:
+            grid = job_grid(job, obstacles)
+        self.store(key, job, obstacles, digests, grid)
+        return self.load(key)
+
+# Turns the grid of an old obstacle set into the grid for `obstacles`, which is the old set minus `removed` plus
+# `added`. Only cells that a removed obstacle blocks are re-checked, against all of the new obstacles; when that is
+# a large part of the grid, the grid sweep (which shares work between neighbouring samples) is faster
+def update_grid(job, grid, obstacles, added, removed, max_stale=0.1):
+    grid = np.array(grid, dtype=np.uint8)
+    if len(removed):
+        stale = np.argwhere(grid & job_grid(job, removed, adaptive=True))
+        if len(stale) > max_stale * grid.size:
+            return job_grid(job, obstacles)
+        grid[tuple(stale.T)] = job_samples(job, obstacles, stale)
+    if len(added):
+        grid |= job_grid(job, added, adaptive=True)
+    return grid
@@ -0,0 +1,29 @@
+import numpy as np
+
+# Array-only geometry of the rectangular car, shared by the controller, the c-space engine and the
+# continuous collision checks without pulling in any plotting code.
+
+# Vectorized get_coords for arrays of poses: (x, y) is the unrotated lower-left corner and angle is in degrees,
+# like the car's Rectangle patch. Returns (N, 4, 2) corners in the same order as get_coords
+def get_coords_batch(x, y, angle, width, height):
+    x, y, angle = np.broadcast_arrays(*(np.asarray(v, dtype=float).ravel() for v in (x, y, angle)))
+    corners = np.array([[0, 0], [width, 0], [width, height], [0, height]], dtype=float)
+    c, s = np.cos(np.radians(angle))[:, None], np.sin(np.radians(angle))[:, None]
+    return np.stack([x[:, None] + corners[:, 0] * c - corners[:, 1] * s,
+                     y[:, None] + corners[:, 0] * s + corners[:, 1] * c], axis=-1)
+
+# (x, y, angle, width, height) of a car given either as a pose tuple/array or as a matplotlib Rectangle.
+# Rectangles are recognised by their methods, so this never imports matplotlib
+def car_pose(car):
+    if hasattr(car, 'get_xy'):
+        return (car.get_x(), car.get_y(), car.get_angle(), car.get_width(), car.get_height())
+    return tuple(car)
+
+# Grows rectangles given as (N, 4, 2) corners in get_coords order by margin (scalar or (N,)) on every side
+def inflate_rectangles(rects, margin):
+    rects = np.asarray(rects, dtype=float)
+    margin = np.broadcast_to(np.asarray(margin, dtype=float), (len(rects),))[:, None]
+    u, v = rects[:, 1] - rects[:, 0], rects[:, 3] - rects[:, 0]
+    u = u / np.linalg.norm(u, axis=1, keepdims=True) * margin
+    v = v / np.linalg.norm(v, axis=1, keepdims=True) * margin
+    return rects + np.stack([-u - v, u - v, u + v, -u + v], axis=1)
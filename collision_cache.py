@@ -0,0 +1,80 @@
+import hashlib
+from collections import OrderedDict
+import numpy as np
+import instrumentation
+
+# Opt-in memoization of collision checks for repeated queries.
+# Configurations are quantized to `resolution` (a scalar, or one step per configuration dimension), so any query
+# that rounds to the same grid cell reuses the answer computed for the first configuration seen in that cell;
+# pick a resolution finer than anything that matters to the caller. Entries are keyed by (scene version, cell),
+# kept in least-recently-used order and evicted once there are more than max_size of them.
+# The cache is bound to one obstacle set: binding different obstacles (or calling invalidate) bumps the version and
+# drops every entry. Binding compares a fingerprint of the obstacles' contents, or a scene's own `version` counter
+# (DynamicScene), rather than their identity, so re-binding a list whose obstacles were appended, removed or
+# changed in place (as set_obstacles / set_arm_obs do) drops the stale entries, while an equal copy keeps them.
+# Fingerprinting reads every vertex, so bind when the obstacles change, never per query.
+
+# Fingerprint of an obstacle set: its version counter if it keeps one, else its length and a digest of every vertex
+def scene_fingerprint(scene):
+    if hasattr(scene, 'version'):
+        return ('version', scene.version)
+    digest = hashlib.sha256()
+    if hasattr(scene, 'offsets'): # PolygonStore: hash its packed buffers directly
+        digest.update(np.ascontiguousarray(scene.offsets, dtype=np.int64).tobytes())
+        digest.update(np.ascontiguousarray(scene.vertices, dtype=float).tobytes())
+    else:
+        for obstacle in scene:
+            obstacle = np.ascontiguousarray(obstacle, dtype=float)
+            digest.update(np.int64(obstacle.size).tobytes())
+            digest.update(obstacle.tobytes())
+    return (len(scene), digest.hexdigest())
+
+class CollisionCache:
+    def __init__(self, resolution=1e-3, max_size=100000):
+        self.resolution = resolution
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.scene = None
+        self.fingerprint = None
+        self.version = 0
+        self.hits = self.misses = self.evictions = 0
+
+    # Makes sure the cached answers belong to this obstacle set
+    def bind(self, scene):
+        fingerprint = scene_fingerprint(scene)
+        self.scene = scene
+        if fingerprint != self.fingerprint:
+            self.fingerprint = fingerprint
+            self.invalidate()
+
+    def invalidate(self):
+        self.version += 1
+        self.entries.clear()
+
+    def key(self, config):
+        steps = self.resolution if isinstance(self.resolution, (tuple, list)) else (self.resolution,) * len(config)
+        return (self.version,) + tuple(int(round(float(v) / step)) for v, step in zip(config, steps))
+
+    # Cached result for config, or compute() stored under its cell
+    def get(self, config, compute):
+        key = self.key(config)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            if instrumentation.enabled: instrumentation.count('cache_hits')
+            return self.entries[key]
+        self.misses += 1
+        if instrumentation.enabled: instrumentation.count('cache_misses')
+        value = self.entries[key] = compute()
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        return value
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / total if total else 0.0,
+                'evictions': self.evictions, 'size': len(self.entries), 'version': self.version}
+
+    def reset_stats(self):
+        self.hits = self.misses = self.evictions = 0
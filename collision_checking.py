@@ -1,11 +1,15 @@
-import matplotlib.pyplot as plt
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+import instrumentation
 from  create_scene import make_polygons, show_scene, create_plot, add_polygon_to_scene
+from broad_phase import SweepAndPrune, box_gaps
+from scene_store import PolygonStore
 
-box_collisions = []
-polygon_collisions = []
+# Nothing in this module keeps state between calls: every check returns its results, so checks can run
+# concurrently from several threads (see check_many)
 
 def bound_polygons(polygons):
+    if isinstance(polygons, PolygonStore): return polygons.boxes # Already computed when the store was built
     # List comprehension of polygons -> For each we get min and max vertices
     bbs = [np.array([polygon.min(axis=0), polygon.max(axis=0)]) for polygon in polygons]
     return bbs
@@ -21,18 +25,19 @@ def bound_circle(center, radius):
 
 #checks if 2 boxes intersect
 def check_box_collision(bbox1, bbox2):
+    if instrumentation.enabled: instrumentation.count('aabb_tests')
     return not (bbox1[1][0] < bbox2[0][0] or 
                 bbox1[0][0] > bbox2[1][0] or 
                 bbox1[1][1] < bbox2[0][1] or 
                 bbox1[0][1] > bbox2[1][1])
 
-# Loop over all pairs of polygons -> bound + check for intersection
+# Bound all polygons + sweep-and-prune to find every pair whose boxes intersect.
+# Returns the pairs as (i, j) index arrays with i < j
 def check_all_boxes(polygons):
     bb = bound_polygons(polygons) #bb is 2D array w/ same len() as polygons
-    for i in range(len(bb)):
-        for j in range(i+1, len(bb)):
-            if check_box_collision(bb[i], bb[j]):
-                box_collisions.append((polygons[i], polygons[j]))
+    if len(bb) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return SweepAndPrune(bb).self_pairs()
 
 #Helper method for getting edges of a polygon as list
 def get_edges(polygons):
@@ -59,8 +64,71 @@ def project(vertices, axis):
             max_proj = projection
     return min_proj, max_proj
 
+# Pads a ragged list of polygons into one (N, V, 2) float array by repeating each polygon's last vertex.
+# A repeated vertex only adds a zero-length edge (zero normal), which can never separate two shapes,
+# so padded polygons give the same SAT answers as the originals
+def pad_polygons(polygons, num_vertices=None):
+    if isinstance(polygons, PolygonStore) and num_vertices is None:
+        return polygons.padded()
+    if isinstance(polygons, np.ndarray) and polygons.dtype != object and polygons.ndim == 3:
+        return polygons.astype(float, copy=False)
+    polygons = [np.asarray(p, dtype=float) for p in polygons]
+    if num_vertices is None:
+        num_vertices = max((len(p) for p in polygons), default=0)
+    padded = np.empty((len(polygons), num_vertices, 2))
+    for i, p in enumerate(polygons):
+        padded[i, :len(p)] = p
+        padded[i, len(p):] = p[-1]
+    return padded
+
+# Edge normals of every polygon in a padded (N, V, 2) array, same layout as get_normals(get_edges(p))
+def batch_normals(padded):
+    edges = padded - np.roll(padded, -1, axis=1)
+    return np.stack([-edges[..., 1], edges[..., 0]], axis=-1)
+
+# Min/max projection of each padded polygon onto each of its pair's axes: (N, V, 2) x (N, A, 2) -> (N, A), (N, A)
+def batch_project(padded, axes):
+    projections = np.matmul(axes, padded.transpose(0, 2, 1))
+    return projections.min(axis=2), projections.max(axis=2)
+
+# Edge normals of padded polygons and the (min, max) projections of each polygon onto its own normals:
+# the precomputed (normals, extents) of a PolygonStore when given, computed otherwise
+def own_axes(padded, geometry=None):
+    if geometry is not None:
+        normals, extents = geometry
+        return normals, extents[..., 0], extents[..., 1]
+    normals = batch_normals(padded)
+    return (normals,) + batch_project(padded, normals)
+
+# Vectorized SAT for N polygon pairs at once: pair k is (polygons1[k], polygons2[k]).
+# Takes ragged lists or padded (N, V, 2) arrays and returns an N-length boolean mask (True = colliding).
+# geometry1 / geometry2 optionally give the padded (normals, extents) of that side (PolygonStore.padded_geometry),
+# which skips computing its normals and projecting it onto them; only the cross projections are left.
+# Pairs are processed in chunks so memory stays bounded for large candidate sets
+def SAT_Collides_batch(polygons1, polygons2, chunk_size=1024, geometry1=None, geometry2=None):
+    started = instrumentation.start()
+    polygons1, polygons2 = pad_polygons(polygons1), pad_polygons(polygons2)
+    n = len(polygons1)
+    result = np.zeros(n, dtype=bool)
+    for start in range(0, n, chunk_size):
+        chunk = slice(start, start+chunk_size)
+        p1, p2 = polygons1[chunk], polygons2[chunk]
+        normals1, own_min1, own_max1 = own_axes(p1, None if geometry1 is None else (geometry1[0][chunk], geometry1[1][chunk]))
+        normals2, own_min2, own_max2 = own_axes(p2, None if geometry2 is None else (geometry2[0][chunk], geometry2[1][chunk]))
+        cross_min1, cross_max1 = batch_project(p1, normals2)
+        cross_min2, cross_max2 = batch_project(p2, normals1)
+        separated = ((own_max1 < cross_min2) | (cross_max2 < own_min1)).any(axis=1) | \
+                    ((cross_max1 < own_min2) | (own_max2 < cross_min1)).any(axis=1)
+        result[chunk] = ~separated
+    if instrumentation.enabled:
+        instrumentation.count('narrow_phase_calls', n)
+        instrumentation.count('narrow_phase_early_exits', n - result.sum())
+    instrumentation.stop('narrow_phase', started)
+    return result
+
 # Using Separating axis theorem to check if 2 polygons collide with each other
 def SAT_Collides(polygon1, polygon2):
+    if instrumentation.enabled: instrumentation.count('narrow_phase_calls')
     edges1 = get_edges(polygon1)
     edges2 = get_edges(polygon2)
 
@@ -71,6 +139,7 @@ def SAT_Collides(polygon1, polygon2):
         min1, max1 = project(polygon1, normal)
         min2, max2 = project(polygon2, normal)
         if max1 < min2 or max2 < min1:
+            if instrumentation.enabled: instrumentation.count('narrow_phase_early_exits')
             return False
     return True
 
@@ -78,9 +147,11 @@ def circle_poly_collides(circle, radius, polygon):
     # circle : (x, y)
     # radius : scalar
     # polygon: [(x1, y1), (x2, y2), ...]
+    if instrumentation.enabled: instrumentation.count('narrow_phase_calls')
 
     edges = get_edges(polygon)
-    normals = get_normals(edges)
+    # Normalize the edge normals too, the circle's projection below assumes unit axes
+    normals = [normal/np.linalg.norm(normal) for normal in get_normals(edges) if np.any(normal)]
     
     # also create axes from circle to each vertex
     for vertex in polygon:
@@ -95,38 +166,101 @@ def circle_poly_collides(circle, radius, polygon):
         min_circle_proj, max_circle_proj = np.dot(normal, circle) - radius, np.dot(normal, circle) + radius
         
         if max1 < min_circle_proj or max_circle_proj < min1:
+            if instrumentation.enabled: instrumentation.count('narrow_phase_early_exits')
             return False  # Seperation axis found
     
     # No seperation axis found, the polygon and circle must be colliding
     return True
 
+# Signed distance from points[k] to the convex polygons[k] for N pairs: points (N, 2), polygons ragged or
+# padded (N, V, 2). Positive outside (distance to the closest edge), negative inside (minus the depth)
+def point_polygon_distance_batch(points, polygons, chunk_size=4096):
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    polygons = pad_polygons(polygons)
+    result = np.empty(len(points))
+    for start in range(0, len(points), chunk_size):
+        p = points[start:start+chunk_size, None, :]
+        a = polygons[start:start+chunk_size]
+        edge = np.roll(a, -1, axis=1) - a
+        length_sq = np.einsum('nvd,nvd->nv', edge, edge)
+        t = np.einsum('nvd,nvd->nv', p - a, edge) / np.where(length_sq > 0, length_sq, 1)
+        closest = a + np.clip(t, 0, 1)[..., None] * edge
+        dist = np.sqrt(np.einsum('nvd,nvd->nv', p - closest, p - closest).min(axis=1))
+        cross = edge[..., 0] * (p - a)[..., 1] - edge[..., 1] * (p - a)[..., 0]
+        inside = (cross >= 0).all(axis=1) | (cross <= 0).all(axis=1)
+        result[start:start+chunk_size] = np.where(inside, -dist, dist)
+    return result
+
+# Lower bounds on the distance between shapes[k] and polygons[k] (padded (N, V, 2) and (N, W, 2) arrays): the gap
+# between their bounding boxes in the frame of the shape's first edge. A rotated rectangle measured in its own
+# frame is bounded by its exact outline rather than by its much larger axis-aligned box
+def frame_gaps(shapes, polygons):
+    shapes, polygons = np.asarray(shapes, dtype=float), np.asarray(polygons, dtype=float)
+    edge = shapes[:, 1] - shapes[:, 0]
+    axis = edge / np.maximum(np.hypot(edge[:, 0], edge[:, 1]), 1e-300)[:, None]
+    frame = np.stack([axis, np.stack([-axis[:, 1], axis[:, 0]], axis=1)], axis=2)
+    shapes, polygons = shapes @ frame, polygons @ frame
+    return box_gaps(np.stack([shapes.min(axis=1), shapes.max(axis=1)], axis=1),
+                    np.stack([polygons.min(axis=1), polygons.max(axis=1)], axis=1))
+
+# Vectorized circle_poly_collides for N (circle, polygon) pairs: centers (N, 2), radius scalar or (N,),
+# polygons ragged or padded (N, V, 2). A circle hits a convex polygon iff its center is inside the polygon
+# or within radius of one of its edges, which is what the SAT axes above decide
+def circle_poly_collides_batch(centers, radius, polygons, chunk_size=4096):
+    started = instrumentation.start()
+    result = point_polygon_distance_batch(centers, polygons, chunk_size) <= radius
+    if instrumentation.enabled:
+        instrumentation.count('narrow_phase_calls', len(result))
+        instrumentation.count('narrow_phase_early_exits', len(result) - result.sum())
+    instrumentation.stop('narrow_phase', started)
+    return result
+
+# Broad-phase + batched SAT over a whole set of polygons.
+# Returns (candidates, colliding): each is an (i, j) pair of index arrays with i < j, candidates being the pairs
+# whose boxes overlap and colliding the subset that SAT confirms
+def find_collisions(polygons, chunk_size=4096):
+    i, j = check_all_boxes(polygons)
+    hits = np.zeros(len(i), dtype=bool)
+    padded = None if isinstance(polygons, PolygonStore) else pad_polygons(polygons)
+    for start in range(0, len(i), chunk_size):
+        a, b = i[start:start+chunk_size], j[start:start+chunk_size]
+        if padded is None:
+            hits[start:start+chunk_size] = SAT_Collides_batch(polygons.padded(a), polygons.padded(b), chunk_size,
+                                                              polygons.padded_geometry(a), polygons.padded_geometry(b))
+        else:
+            hits[start:start+chunk_size] = SAT_Collides_batch(padded[a], padded[b], chunk_size)
+    return (i, j), (i[hits], j[hits])
+
+# Symmetric N x N sparse (CSR) matrix with True at [i, j] and [j, i] for every colliding pair
+def collision_matrix(polygons):
+    from scipy.sparse import coo_matrix
+    _, (i, j) = find_collisions(polygons)
+    n = len(polygons)
+    data = np.ones(2 * len(i), dtype=bool)
+    return coo_matrix((data, (np.concatenate([i, j]), np.concatenate([j, i]))), shape=(n, n)).tocsr()
+
+# Runs check(*query) for every query on a thread pool and returns the results in order.
+# The heavy numpy work releases the GIL, so independent queries (e.g. different robots or scenes) overlap:
+#     results = check_many(find_collisions, [(scene,) for scene in scenes])
+def check_many(check, queries, workers=None):
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda query: check(*query), queries))
+
 # This function is for project API, uses broad-phase bounding boxes + SAT to check for collision b/w polygons
 def collides(poly1:np.ndarray, poly2:np.ndarray):
-    box_collisions.clear()
-    polygon_collisions.clear()
-    check_all_boxes([poly1, poly2])
-    for pair in box_collisions:
-        p1, p2 = pair #unpack polygons
-        if SAT_Collides(p1, p2): return False
-    return True
+    if not check_box_collision(*bound_polygons([poly1, poly2])): return True
+    return not SAT_Collides(poly1, poly2)
 
 def plot(polys:np.ndarray):
     #Step 1: get all the collisions
-    box_collisions.clear()
-    polygon_collisions.clear()
-    check_all_boxes(polys)
-    for pair in box_collisions:
-        p1,p2 = pair
-        if SAT_Collides(p1,p2): polygon_collisions.append(pair)
+    _, (i, j) = find_collisions(polys)
     
     #Step 2: plot polygons, differentiating those that collided and those that didn't
-    unique_colliding_polygons = set(tuple(str(polygon.tolist())) for pair in polygon_collisions for polygon in pair) #use list-comp to unpack tuples
+    colliding = np.zeros(len(polys), dtype=bool)
+    colliding[i] = colliding[j] = True
     ax = create_plot()
-    for p in polys:
-        if tuple(str(p.tolist())) in unique_colliding_polygons:
-            add_polygon_to_scene(p, ax, True)
-        else:
-            add_polygon_to_scene(p, ax, False)
+    for p, hit in zip(polys, colliding):
+        add_polygon_to_scene(p, ax, hit)
     show_scene(ax)
 
 
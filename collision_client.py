@@ -0,0 +1,76 @@
+import json
+import socket
+import numpy as np
+from car_geometry import car_pose
+
+# Client for collision_server.py. One client is one connection and is not thread-safe; give every thread or
+# process its own. The single-query methods mirror the in-process functions and their return conventions:
+#   collides(polygon)                      like collision_checking.collides against every obstacle: True if free
+#   check_car(car)                         like rigid_body.check_car: True if the car is free
+#   check_arm_collisions(theta1, theta2)   like Arm_Controller.check_arm_collisions: [joint1, joint2, joint3, link1, link2]
+# and each has a batched variant that sends many queries in one request.
+
+class CollisionClient:
+    def __init__(self, path=None, host='127.0.0.1', port=8765, arm=None):
+        if path is not None:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(path)
+        else:
+            self.sock = socket.create_connection((host, port))
+        self.file = self.sock.makefile('rb')
+        self.arm = {} if arm is None else dict(arm) # Arm geometry overrides, see collision_server.DEFAULT_ARM
+        self.next_id = 0
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def request(self, op, **fields):
+        self.next_id += 1
+        self.sock.sendall(json.dumps({'id': self.next_id, 'op': op, **fields}).encode() + b'\n')
+        while True:
+            line = self.file.readline()
+            if not line:
+                raise ConnectionError("collision server closed the connection")
+            response = json.loads(line)
+            if response.get('id') == self.next_id:
+                break
+        if 'error' in response:
+            raise RuntimeError(response['error'])
+        return response['result']
+
+    # For each polygon (a list of (V_i, 2) vertex arrays), does it hit any obstacle?
+    def polygons_collide(self, polygons):
+        return np.array(self.request('polygons', polygons=[np.asarray(p, dtype=float).tolist() for p in polygons]), dtype=bool)
+
+    def collides(self, polygon):
+        return not self.polygons_collide([polygon])[0]
+
+    # For each (x, y, angle) pose, does a width x height car there hit an obstacle (or leave bounds, if given)?
+    def car_collisions(self, poses, width, height, bounds=None):
+        poses = np.asarray(poses, dtype=float).reshape(-1, 3).tolist()
+        bounds = None if bounds is None else [float(b) for b in bounds]
+        return np.array(self.request('car', poses=poses, width=float(width), height=float(height), bounds=bounds), dtype=bool)
+
+    # car is a pose tuple (x, y, angle, width, height) or a Rectangle, as for rigid_body.check_car
+    def check_car(self, car):
+        x, y, angle, width, height = car_pose(car)
+        return not self.car_collisions([(x, y, angle)], width, height)[0]
+
+    # (N, 5) collision flags of the arm for N (theta1, theta2) configurations
+    def arm_collisions(self, theta1, theta2):
+        configs = np.stack(np.broadcast_arrays(np.ravel(theta1), np.ravel(theta2)), axis=1).astype(float)
+        result = self.request('arm', configs=configs.tolist(), arm=self.arm)
+        return np.array(result, dtype=bool).reshape(-1, 5)
+
+    def check_arm_collisions(self, theta1, theta2):
+        return self.arm_collisions(theta1, theta2)[0].tolist()
+
+    def stats(self):
+        return self.request('stats')
@@ -0,0 +1,165 @@
+import argparse
+import asyncio
+import json
+import os
+import numpy as np
+from c_space import ObstacleSet, arm_collisions, car_collisions
+from car_geometry import get_coords_batch
+from collision_checking import pad_polygons
+from create_scene import load_polygons
+from tiled_c_space import ARM_GEOMETRY, job_arm
+
+# Local collision-query server: loads a scene once, keeps its broad-phase index and padded geometry in memory and
+# answers polygon, car and arm queries from any number of client processes (see collision_client.py).
+# The protocol is one JSON object per line in each direction; every request carries an "id" that its response
+# echoes back, so a client may pipeline requests on one connection:
+#   {"id": 1, "op": "polygons", "polygons": [[[x, y], ...], ...]}                  -> per polygon: hits an obstacle
+#   {"id": 2, "op": "car", "poses": [[x, y, angle], ...], "width": w, "height": h,
+#    "bounds": [x_min, x_max, y_min, y_max] or null}                              -> per pose: collides
+#   {"id": 3, "op": "arm", "configs": [[theta1, theta2], ...], "arm": {...}}       -> per config: 5 part flags
+#   {"id": 4, "op": "stats"}
+# "arm" optionally overrides fields of DEFAULT_ARM (see request_arm).
+# Responses are {"id": ..., "result": [...]} or {"id": ..., "error": "..."}.
+# Requests of the same kind (and the same car size / arm geometry) that arrive within max_delay seconds of each
+# other are coalesced into one vectorized batch, which runs in a worker thread so the event loop keeps accepting.
+
+DEFAULT_ARM = {'joint1': [1, 1], 'rad': 0.05, 'rwid': 0.1, 'rlen1': 0.4, 'rlen2': 0.25}
+
+# Arm geometry of a request: DEFAULT_ARM updated with the request's overrides, which may only name ARM_GEOMETRY
+# fields. joint1 becomes an (x, y) pair of floats and the other fields positive floats, so nothing else a client
+# sends ever reaches the shared Arm_Controller
+def request_arm(overrides):
+    if not isinstance(overrides, dict):
+        raise ValueError("arm must be an object")
+    unknown = set(overrides) - set(ARM_GEOMETRY)
+    if unknown:
+        raise ValueError(f"unknown arm fields {sorted(unknown)}")
+    geometry = {**DEFAULT_ARM, **overrides}
+    joint1 = np.asarray(geometry['joint1'], dtype=float)
+    if joint1.shape != (2,) or not np.isfinite(joint1).all():
+        raise ValueError("arm joint1 must be a finite [x, y] pair")
+    lengths = {name: float(geometry[name]) for name in ARM_GEOMETRY if name != 'joint1'}
+    if not all(np.isfinite(v) and v > 0 for v in lengths.values()):
+        raise ValueError(f"arm {', '.join(lengths)} must be finite and positive")
+    return {'joint1': joint1.tolist(), **lengths}
+
+class CollisionServer:
+    def __init__(self, obstacles, max_delay=0.002, max_batch=1 << 16):
+        self.obstacles = ObstacleSet(obstacles)
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self.pending = {} # batch key -> [(items, future), ...]
+        self.arms = {}
+        self.requests = self.batches = self.items = 0
+
+    # Queues items for the batch with this key and waits for their slice of the batch's result
+    async def submit(self, key, items, run):
+        if not len(items):
+            return []
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        queue = self.pending.setdefault(key, [])
+        queue.append((items, future))
+        if len(queue) == 1:
+            loop.call_later(self.max_delay, lambda: loop.create_task(self.flush(key, run)))
+        elif sum(len(i) for i, _ in queue) >= self.max_batch:
+            loop.create_task(self.flush(key, run))
+        return await future
+
+    async def flush(self, key, run):
+        queue = self.pending.pop(key, None)
+        if not queue:
+            return
+        items = [item for chunk, _ in queue for item in chunk]
+        self.batches += 1
+        self.items += len(items)
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(None, run, items)
+        except Exception as e:
+            for _, future in queue:
+                if not future.done(): future.set_exception(e)
+            return
+        start = 0
+        for chunk, future in queue:
+            if not future.done(): future.set_result(result[start:start+len(chunk)].tolist())
+            start += len(chunk)
+
+    def arm(self, geometry):
+        key = tuple(json.dumps(geometry[name]) for name in ARM_GEOMETRY)
+        if key not in self.arms:
+            self.arms[key] = job_arm({'geometry': geometry})
+        return self.arms[key]
+
+    async def answer(self, request):
+        op = request.get('op')
+        if op == 'polygons':
+            run = lambda polygons: self.obstacles.polygons_collide(pad_polygons(polygons))
+            return await self.submit(('polygons',), request['polygons'], run)
+        if op == 'car':
+            width, height = float(request['width']), float(request['height'])
+            bounds = request.get('bounds')
+            def run(poses):
+                poses = np.asarray(poses, dtype=float).reshape(-1, 3)
+                if bounds is None:
+                    return self.obstacles.polygons_collide(get_coords_batch(*poses.T, width, height))
+                return car_collisions(*poses.T, width, height, self.obstacles, tuple(bounds))
+            return await self.submit(('car', width, height, json.dumps(bounds)), request['poses'], run)
+        if op == 'arm':
+            geometry = request_arm(request.get('arm', {}))
+            arm = self.arm(geometry)
+            def run(configs):
+                configs = np.asarray(configs, dtype=float).reshape(-1, 2)
+                return arm_collisions(arm, configs[:, 0], configs[:, 1], self.obstacles)
+            return await self.submit(('arm', json.dumps(geometry, sort_keys=True)), request['configs'], run)
+        if op == 'stats':
+            return {'obstacles': len(self.obstacles), 'requests': self.requests, 'batches': self.batches, 'items': self.items}
+        raise ValueError(f"unknown op {op!r}")
+
+    async def respond(self, line, writer):
+        self.requests += 1
+        request = {}
+        try:
+            request = json.loads(line)
+            response = {'id': request.get('id'), 'result': await self.answer(request)}
+        except Exception as e:
+            response = {'id': request.get('id'), 'error': f"{type(e).__name__}: {e}"}
+        writer.write(json.dumps(response).encode() + b'\n')
+        await writer.drain()
+
+    async def handle(self, reader, writer):
+        tasks = set()
+        try:
+            while line := await reader.readline():
+                task = asyncio.create_task(self.respond(line, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks)
+        finally:
+            writer.close()
+
+    # Serves on a Unix socket if path is given, otherwise on host:port
+    async def serve(self, path=None, host='127.0.0.1', port=8765, ready=None):
+        limit = 1 << 26 # Longest accepted request line, in bytes
+        if path is not None:
+            if os.path.exists(path): os.remove(path)
+            server = await asyncio.start_unix_server(self.handle, path, limit=limit)
+        else:
+            server = await asyncio.start_server(self.handle, host, port, limit=limit)
+        if ready is not None: ready(server)
+        async with server:
+            await server.serve_forever()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve collision queries against one scene")
+    parser.add_argument('scene', help="scene file or store directory, anything load_polygons reads")
+    parser.add_argument('--socket', help="Unix socket path (default: TCP on --host/--port)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--max-delay', type=float, default=0.002, help="seconds to wait for requests to coalesce")
+    args = parser.parse_args(argv)
+    server = CollisionServer(load_polygons(args.scene), args.max_delay)
+    print(f"serving {len(server.obstacles)} obstacles on {args.socket or f'{args.host}:{args.port}'}")
+    asyncio.run(server.serve(args.socket, args.host, args.port))
+
+if __name__ == '__main__':
+    main()
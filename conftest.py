@@ -0,0 +1 @@
+# Lets pytest import the flat modules at the repository root from tests/
@@ -0,0 +1,93 @@
+import numpy as np
+from c_space import as_obstacle_set, arm_obstacles, arm_geometry, car_coords_collide
+from car_geometry import get_coords_batch, inflate_rectangles
+
+# Continuous (swept) collision checking for straight-line motion segments in configuration space.
+# Every segment gets a bound D on how far any point of the robot can move along it. The segment is sampled
+# n times so that consecutive samples are at most D / n apart, and each sample is tested with the robot's
+# shapes grown by the margin D / (2n). Every intermediate pose lies inside some grown sample, so the test is
+# conservative: it never misses a contact, and it may report contacts up to `tolerance` early or nearby.
+# The stretch right after the start is covered by samples whose margins shrink geometrically toward the start
+# pose instead, so a robot that starts free but closer to an obstacle than D / (2n) can still move away from it.
+# All samples of all segments are checked in one batched call.
+
+# Halvings of the first stretch; the start pose itself is tested with a margin of at most tolerance / 2^START_LEVELS
+START_LEVELS = 10
+
+# Sample parameters for every sample of every segment: (segment index, t, margin, early), where early is the start
+# of the stretch of the segment the sample covers, i.e. the contact time reported if it hits.
+# Samples at t = k/n, k >= 1, cover [t - 1/(2n), t + 1/(2n)]. The first stretch [0, 1/(2n)] is split into
+# [w/2, w] for w = 1/(2n), 1/(4n), ..., each tested at its middle with margin D w/4, plus the start pose covering
+# the rest with margin D w/2 for the last w
+def sample_segments(bounds, tolerance):
+    bounds = np.asarray(bounds, dtype=float)
+    steps = np.maximum(np.ceil(bounds / (2 * tolerance)), 1).astype(np.int64)
+    half = 0.5 / steps
+    segment = np.repeat(np.arange(len(bounds)), steps)
+    k = np.arange(len(segment)) - np.repeat(np.cumsum(steps) - steps, steps) + 1
+    t = k / steps[segment]
+    widths = (half[:, None] * 0.5 ** np.arange(START_LEVELS)).ravel()
+    near = np.repeat(np.arange(len(bounds)), START_LEVELS)
+    last = half * 0.5 ** START_LEVELS
+    return (np.concatenate([segment, near, np.arange(len(bounds))]),
+            np.concatenate([t, 0.75 * widths, np.zeros(len(bounds))]),
+            np.concatenate([bounds[segment] * half[segment], bounds[near] * widths / 4, bounds * last]),
+            np.concatenate([t - half[segment], widths / 2, np.zeros(len(bounds))]))
+
+# Time of first contact in [0, 1] for every segment from the per-sample collision flags, np.inf if none:
+# the earliest start of a stretch covered by a sample that hit
+def first_contact(segment, early, hits, num_segments):
+    contact = np.full(num_segments, np.inf)
+    np.minimum.at(contact, segment[hits], early[hits])
+    return contact
+
+# Sweep tolerance for a robot that starts `clearance` away from the nearest obstacle: at most half the clearance, so
+# a motion that keeps its distance to the obstacles is not reported as contact, but never finer than
+# tolerance * finest, which bounds the number of samples per segment
+def sweep_tolerance(clearance, tolerance=0.005, finest=0.01):
+    return float(np.clip(clearance / 2, tolerance * finest, tolerance))
+
+# Upper bound on how far any point of the car moves between poses (x, y, angle in degrees), arrays of shape (N, 3)
+def car_motion_bound(start, end, width, height):
+    delta = np.atleast_2d(np.asarray(end, dtype=float) - np.asarray(start, dtype=float))
+    return np.hypot(delta[:, 0], delta[:, 1]) + np.abs(np.radians(delta[:, 2])) * np.hypot(width, height)
+
+# Car segments from start poses to end poses, both (N, 3) arrays of (x, y, angle in degrees) interpolated
+# linearly. Leaving the workspace bounds also counts as contact, like check_boundary
+def car_first_contact(start, end, width, height, obstacles, tolerance=0.005, bounds=(0, 2, 0, 2)):
+    start, end = np.atleast_2d(np.asarray(start, dtype=float)), np.atleast_2d(np.asarray(end, dtype=float))
+    obstacles = as_obstacle_set(obstacles)
+    delta = end - start
+    motion = car_motion_bound(start, end, width, height)
+    segment, t, margin, early = sample_segments(motion, tolerance)
+    poses = start[segment] + t[:, None] * delta[segment]
+    coords = inflate_rectangles(get_coords_batch(poses[:, 0], poses[:, 1], poses[:, 2], width, height), margin)
+    hits = car_coords_collide(coords, obstacles, bounds)
+    return first_contact(segment, early, hits, len(start))
+
+# Bounds on how far points of the arm's first and second link (with their joint circles) can move per radian
+def arm_reach(arm):
+    link1 = max(np.hypot(arm.rad + arm.rlen1, arm.rwid/2), 3*arm.rad + arm.rlen1)
+    link2 = max(np.hypot(arm.rad + arm.rlen2, arm.rwid/2), 3*arm.rad + arm.rlen2)
+    return link1, 2*arm.rad + arm.rlen1, link2
+
+# Upper bound on how far any point of the arm moves between (theta1, theta2) configurations, arrays of shape (N, 2)
+def arm_motion_bound(arm, start, end):
+    delta = np.abs(np.atleast_2d(np.asarray(end, dtype=float) - np.asarray(start, dtype=float)))
+    link1, joint2_reach, link2 = arm_reach(arm)
+    return np.maximum(delta[:, 0] * link1, delta[:, 0] * joint2_reach + delta[:, 1] * link2)
+
+# Arm segments from start to end (theta1, theta2) pairs, both (N, 2) arrays interpolated linearly.
+# Link 2 uses an absolute angle, so it only translates with joint2 when theta1 changes
+def arm_first_contact(arm, start, end, obstacles=None, tolerance=0.005):
+    start, end = np.atleast_2d(np.asarray(start, dtype=float)), np.atleast_2d(np.asarray(end, dtype=float))
+    obstacles = arm_obstacles(arm, obstacles)
+    delta = end - start
+    motion = arm_motion_bound(arm, start, end)
+    segment, t, margin, early = sample_segments(motion, tolerance)
+    thetas = start[segment] + t[:, None] * delta[segment]
+    joints, rects = arm_geometry(arm, thetas[:, 0], thetas[:, 1])
+    joint_hits = obstacles.circles_collide(joints.reshape(-1, 2), np.repeat(arm.rad + margin, 3)).reshape(-1, 3)
+    rect_hits = obstacles.polygons_collide(inflate_rectangles(rects.reshape(-1, 4, 2), np.repeat(margin, 2))).reshape(-1, 2)
+    hits = joint_hits.any(axis=1) | rect_hits.any(axis=1)
+    return first_contact(segment, early, hits, len(start))
@@ -1,11 +1,15 @@
+import os
 import numpy as np
-import matplotlib.pyplot as plt
 import random
-from scipy.spatial import ConvexHull
+from scene_store import PolygonStore
+
+# Plotting (matplotlib) and make_polygons' hull (scipy) are imported where they are used, so modules that only need
+# scenes as arrays start without them
 
 # Returns an np array of convex polygons (2D-np array)
 #p is # of polygons, n_min/n_max are bounds on # of vertices, r_min/r_max are bounds on size, x/y-dim is size of grid
 def make_polygons(p, n_min, n_max, r_min, r_max, xdim=2 ,ydim=2):
+    from scipy.spatial import ConvexHull
     # define center of all the polygons
     center_pol = []
     
@@ -30,16 +34,63 @@ def make_polygons(p, n_min, n_max, r_min, r_max, xdim=2 ,ydim=2):
         
     return np.array(polygons, dtype = object)
 
+# Vectorized, seeded counterpart of make_polygons for large scenes: yields PolygonStore chunks of up to chunk_size
+# polygons. Vertices are drawn at sorted random angles on a randomly sized and rotated ellipse, which is always
+# convex, so no per-polygon ConvexHull is needed. The same seed and chunk_size always give the same scene
+def generate_polygons(p, n_min, n_max, r_min, r_max, xdim=2, ydim=2, seed=None, chunk_size=100000):
+    rng = np.random.default_rng(seed)
+    counts = rng.integers(n_min, n_max, size=p, endpoint=True)
+    for start in range(0, p, chunk_size):
+        n = counts[start:start+chunk_size]
+        k = len(n)
+        centers = rng.uniform((0, 0), (xdim, ydim), size=(k, 2))
+        axes = rng.uniform(r_min, r_max, size=(k, 2))
+        rotation = rng.uniform(0, 2*np.pi, size=(k, 1))
+        angles = rng.uniform(0, 2*np.pi, size=(k, n.max()))
+        angles[np.arange(n.max()) >= n[:, None]] = np.inf # Unused slots sort to the end
+        angles = np.sort(angles, axis=1)[np.arange(n.max()) < n[:, None]]
+        owner = np.repeat(np.arange(k), n)
+        x, y = axes[owner, 0] * np.cos(angles), axes[owner, 1] * np.sin(angles)
+        c, s = np.cos(rotation[owner, 0]), np.sin(rotation[owner, 0])
+        vertices = centers[owner] + np.stack([c*x - s*y, s*x + c*y], axis=1)
+        yield PolygonStore(vertices, np.concatenate([[0], np.cumsum(n)]).astype(np.int64))
+
+# Streams a generate_polygons scene chunk by chunk into a PolygonStore directory (load it with load_polygons),
+# so scenes far larger than memory can be written without pickling. The seed is resolved into one SeedSequence
+# first, so sizing the files and generating the polygons draw the same vertex counts even when seed is None
+def stream_polygons(filename, p, n_min, n_max, r_min, r_max, xdim=2, ydim=2, seed=None, chunk_size=100000):
+    seed = np.random.SeedSequence(seed)
+    total = int(np.random.default_rng(seed).integers(n_min, n_max, size=p, endpoint=True).sum())
+    os.makedirs(filename, exist_ok=True)
+    shapes = {'vertices': (total, 2), 'offsets': (p + 1,), 'boxes': (p, 2, 2), 'normals': (total, 2), 'extents': (total, 2)}
+    out = {name: np.lib.format.open_memmap(os.path.join(filename, name + '.npy'), mode='w+',
+                                           dtype=np.int64 if name == 'offsets' else float, shape=shape)
+           for name, shape in shapes.items()}
+    out['offsets'][0] = 0
+    polygon, vertex = 0, 0
+    for chunk in generate_polygons(p, n_min, n_max, r_min, r_max, xdim, ydim, seed, chunk_size):
+        k, m = len(chunk), len(chunk.vertices)
+        for name in ('vertices', 'normals', 'extents'):
+            out[name][vertex:vertex+m] = getattr(chunk, name)
+        out['boxes'][polygon:polygon+k] = chunk.boxes
+        out['offsets'][polygon+1:polygon+k+1] = chunk.offsets[1:] + vertex
+        polygon, vertex = polygon + k, vertex + m
+    for array in out.values():
+        array.flush()
+
 def add_polygon_to_scene(polygon, ax, fill):
+    import matplotlib.pyplot as plt
     pol = plt.Polygon(polygon, closed = True, fill=fill,color = 'black',alpha = 0.4)
     ax.add_patch(pol)
 
 def create_plot():
+    import matplotlib.pyplot as plt
     fig, ax = plt.subplots(dpi=100)
     return ax
 
 # Takes in our generated polygons and generates scene that's 800 x 800 px
 def show_scene(ax):
+    import matplotlib.pyplot as plt
     ax.set_xlim(0,2)
     ax.set_ylim(0,2)
     ax.set_aspect('equal')
@@ -47,10 +98,20 @@ def show_scene(ax):
     plt.grid(True)
     plt.show()
 
+# A .npz filename (or an existing PolygonStore) saves the packed, pickle-free format; anything else keeps the old object array
 def save_polygons(polygons, filename):
-    np.save(filename,arr=polygons,allow_pickle=True)
+    if isinstance(polygons, PolygonStore) or str(filename).endswith('.npz'):
+        if not isinstance(polygons, PolygonStore): polygons = PolygonStore.from_polygons(polygons)
+        polygons.save(filename)
+    else:
+        np.save(filename,arr=polygons,allow_pickle=True)
 
+# .npz files and store directories load as a PolygonStore (directories memory-mapped), .npy files as the old object array
 def load_polygons(filename):
+    if str(filename).endswith('.npz'):
+        return PolygonStore.load(filename)
+    if os.path.isdir(filename):
+        return PolygonStore.load(filename, mmap_mode='r')
     return np.load(filename,allow_pickle=True)
 
 
@@ -0,0 +1,140 @@
+import hashlib
+import os
+import numpy as np
+from collision_checking import point_polygon_distance_batch
+from c_space import ObstacleSet
+from gjk import ConvexShape, gjk_distance
+
+# Rasterized signed distance field of an obstacle set over the workspace.
+# Node values are exact signed distances to the obstacles (negative inside), optionally truncated at
+# max_distance. Queries interpolate bilinearly; the distance function is 1-Lipschitz, so an interpolated value is
+# within one cell diagonal (`error`) of the truth. Only queries inside that band around a disc's or capsule's
+# radius need the exact geometric test, which is run against the obstacles the field was built from. The field
+# knows nothing outside its bounds, so discs and capsules that reach outside them always take the exact test.
+
+class SignedDistanceField:
+    def __init__(self, values, bounds, obstacles=None):
+        self.values = np.asarray(values, dtype=float)
+        self.bounds = tuple(float(b) for b in bounds)
+        nx, ny = self.values.shape
+        self.spacing = np.array([(self.bounds[1] - self.bounds[0]) / (nx - 1), (self.bounds[3] - self.bounds[2]) / (ny - 1)])
+        self.error = float(np.hypot(*self.spacing))
+        self.obstacles = None if obstacles is None else ObstacleSet(obstacles)
+        self.shapes = None if obstacles is None else [ConvexShape(o) for o in obstacles]
+
+    # Samples the field on a resolution x resolution grid of nodes (or an (nx, ny) pair) covering bounds.
+    # With max_distance set, only obstacles within that distance of a node are considered and values are capped
+    @classmethod
+    def build(cls, obstacles, resolution=256, bounds=(0, 2, 0, 2), max_distance=None, chunk_size=1 << 14):
+        nx, ny = (resolution, resolution) if np.isscalar(resolution) else resolution
+        if max_distance is None:
+            max_distance = np.hypot(bounds[1] - bounds[0], bounds[3] - bounds[2])
+        xs, ys = np.linspace(bounds[0], bounds[1], nx), np.linspace(bounds[2], bounds[3], ny)
+        nodes = np.stack(np.meshgrid(xs, ys, indexing='ij'), axis=-1).reshape(-1, 2)
+        values = np.full(len(nodes), float(max_distance))
+        if len(obstacles):
+            obstacle_set = ObstacleSet(obstacles)
+            for start in range(0, len(nodes), chunk_size):
+                chunk = nodes[start:start+chunk_size]
+                boxes = np.stack([chunk - max_distance, chunk + max_distance], axis=1)
+                node, obstacle = obstacle_set.index.query_batch(boxes)
+                dist = point_polygon_distance_batch(chunk[node], obstacle_set.padded[obstacle])
+                np.minimum.at(values, start + node, dist)
+        return cls(values.reshape(nx, ny), bounds, obstacles)
+
+    # Loads the field for these obstacles and parameters from cache_dir, building and saving it on a miss
+    @classmethod
+    def cached(cls, obstacles, resolution=256, bounds=(0, 2, 0, 2), max_distance=None, cache_dir='.sdf_cache'):
+        digest = hashlib.sha256(repr((resolution, tuple(bounds), max_distance)).encode())
+        for o in obstacles:
+            digest.update(np.ascontiguousarray(o, dtype=float).tobytes() + b'|')
+        filename = os.path.join(cache_dir, f"sdf-{digest.hexdigest()[:32]}.npz")
+        if os.path.exists(filename):
+            return cls.load(filename, obstacles)
+        field = cls.build(obstacles, resolution, bounds, max_distance)
+        os.makedirs(cache_dir, exist_ok=True)
+        field.save(filename)
+        return field
+
+    def save(self, filename):
+        np.savez(filename, values=self.values, bounds=np.array(self.bounds))
+
+    # Without obstacles the field still answers lookups, and ambiguous disc/capsule queries count as collisions
+    @classmethod
+    def load(cls, filename, obstacles=None):
+        with np.load(filename, allow_pickle=False) as data:
+            return cls(data['values'], data['bounds'], obstacles)
+
+    # Bilinearly interpolated signed distance at points (N, 2); points outside bounds are clamped to the border,
+    # so their values say nothing about the points themselves
+    def lookup(self, points):
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        nx, ny = self.values.shape
+        u = np.clip((points - [self.bounds[0], self.bounds[2]]) / self.spacing, 0, [nx - 1, ny - 1])
+        i = np.minimum(u.astype(np.int64), [nx - 2, ny - 2])
+        fx, fy = (u - i).T
+        v = self.values
+        return ((1-fx)*(1-fy)*v[i[:, 0], i[:, 1]] + fx*(1-fy)*v[i[:, 0]+1, i[:, 1]] +
+                (1-fx)*fy*v[i[:, 0], i[:, 1]+1] + fx*fy*v[i[:, 0]+1, i[:, 1]+1])
+
+    # Which of the shapes spanning low..high (N, 2) grown by radius lie inside the field's bounds
+    def covers(self, low, high, radius):
+        grow = np.broadcast_to(np.asarray(radius, dtype=float), (len(low),))[:, None]
+        low, high = np.asarray(low, dtype=float) - grow, np.asarray(high, dtype=float) + grow
+        return (low[:, 0] >= self.bounds[0]) & (high[:, 0] <= self.bounds[1]) & \
+               (low[:, 1] >= self.bounds[2]) & (high[:, 1] <= self.bounds[3])
+
+    # Discs the field alone proves clear of every obstacle
+    def discs_free(self, centers, radius):
+        centers = np.asarray(centers, dtype=float).reshape(-1, 2)
+        return (self.lookup(centers) > np.asarray(radius) + self.error) & self.covers(centers, centers, radius)
+
+    # For each disc, does it hit an obstacle? Exact test only for discs within the interpolation error band or
+    # reaching outside the field
+    def discs_collide(self, centers, radius):
+        centers = np.asarray(centers, dtype=float).reshape(-1, 2)
+        radius = np.broadcast_to(np.asarray(radius, dtype=float), (len(centers),))
+        d = self.lookup(centers)
+        inside = self.covers(centers, centers, radius)
+        result = (d < radius - self.error) & inside
+        unsure = np.flatnonzero((np.abs(d - radius) <= self.error) | ~inside)
+        if self.obstacles is None:
+            result[unsure] = True
+        elif len(unsure):
+            result[unsure] = self.obstacles.circles_collide(centers[unsure], radius[unsure])
+        return result
+
+    # Sample points along each capsule's segment p0 -> p1, at most one cell apart: (N, S, 2) points and the spacing
+    def capsule_samples(self, p0, p1):
+        p0, p1 = np.asarray(p0, dtype=float).reshape(-1, 2), np.asarray(p1, dtype=float).reshape(-1, 2)
+        length = np.linalg.norm(p1 - p0, axis=1)
+        steps = max(int(np.ceil(length.max(initial=0) / self.spacing.min())), 1)
+        t = np.linspace(0, 1, steps + 1)
+        return p0[:, None] + t[None, :, None] * (p1 - p0)[:, None], length / steps
+
+    # Capsules (segments grown by radius) the field alone proves clear: every point of a segment is within half
+    # a sample spacing of some sample
+    def capsules_free(self, p0, p1, radius):
+        p0, p1 = np.asarray(p0, dtype=float).reshape(-1, 2), np.asarray(p1, dtype=float).reshape(-1, 2)
+        samples, spacing = self.capsule_samples(p0, p1)
+        d = self.lookup(samples.reshape(-1, 2)).reshape(samples.shape[:2]).min(axis=1)
+        return (d > np.asarray(radius) + spacing / 2 + self.error) & self.covers(np.minimum(p0, p1), np.maximum(p0, p1), radius)
+
+    # For each capsule, does it hit an obstacle? Undecided capsules (near the error band or reaching outside the
+    # field) fall back to exact GJK against nearby obstacles
+    def capsules_collide(self, p0, p1, radius):
+        p0, p1 = np.asarray(p0, dtype=float).reshape(-1, 2), np.asarray(p1, dtype=float).reshape(-1, 2)
+        radius = np.broadcast_to(np.asarray(radius, dtype=float), (len(p0),))
+        samples, spacing = self.capsule_samples(p0, p1)
+        d = self.lookup(samples.reshape(-1, 2)).reshape(samples.shape[:2]).min(axis=1)
+        inside = self.covers(np.minimum(p0, p1), np.maximum(p0, p1), radius)
+        result = (d < radius - self.error) & inside
+        unsure = np.flatnonzero(~result & ((d <= radius + spacing / 2 + self.error) | ~inside))
+        if self.obstacles is None:
+            result[unsure] = True
+            return result
+        for k in unsure:
+            box = np.array([np.minimum(p0[k], p1[k]) - radius[k], np.maximum(p0[k], p1[k]) + radius[k]])
+            capsule = ConvexShape([p0[k], p1[k]], radius[k])
+            result[k] = any(gjk_distance(capsule, self.shapes[o]).distance <= 0 for o in self.obstacles.index.query(box))
+        return result
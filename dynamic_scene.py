@@ -0,0 +1,236 @@
+import numpy as np
+from broad_phase import SweepAndPrune
+from c_space import ObstacleSet, arm_geometry
+from car_geometry import get_coords_batch, inflate_rectangles
+from collision_checking import SAT_Collides_batch, circle_poly_collides_batch
+from continuous_collision import sample_segments, first_contact, car_motion_bound, arm_motion_bound
+
+# Mutable obstacle set for worlds whose obstacles are added, removed and moved every tick.
+# Every obstacle gets a stable integer id that never changes or gets reused, and lives in a slot of preallocated
+# padded vertex / bounding box arrays, so updates only touch the slots that changed. The broad-phase indexes are
+# patched in place (SweepAndPrune.update) the next time they are queried instead of being rebuilt, and capacity
+# grows by doubling. `obstacles` is an ObstacleSet view of the current geometry that works with every batched
+# query (arm_collisions, car_collisions, the c-space and continuous collision functions).
+# The scene also remembers where each obstacle was at the start of the current time step. Between end_step()
+# calls every vertex moves on a straight line from its start position to its current one; for rigid motions
+# that keeps each obstacle convex (a blend of two rotations is a scaled rotation) and no point of it moves
+# further than its furthest vertex, which is what the moving-obstacle checks below rely on.
+
+# Box of a free slot: it sorts after every real box and never overlaps anything
+EMPTY_BOX = np.array([[np.inf, np.inf], [-np.inf, -np.inf]])
+
+class DynamicScene:
+    def __init__(self, polygons=(), capacity=16):
+        capacity = max(int(capacity), 1)
+        self.vertices = np.zeros((capacity, 1, 2)) # Padded by repeating the last vertex, like pad_polygons
+        self.start = self.vertices.copy() # Vertices at the start of the current time step
+        self.counts = np.zeros(capacity, dtype=np.int64) # Real vertices per slot, 0 = free
+        self.slot_ids = np.full(capacity, -1, dtype=np.int64)
+        self.slots = {} # id -> slot
+        self.free_slots = list(range(capacity - 1, -1, -1))
+        self.moved = set() # Slots whose start and current vertices differ
+        self.dirty = set() # Slots whose boxes changed since the indexes were last synced
+        self.next_id = 0
+        self.version = 0 # Bumped on every change, so a CollisionCache bound to the scene drops stale answers
+        self.index = SweepAndPrune(np.broadcast_to(EMPTY_BOX, (capacity, 2, 2)).copy())
+        self.swept_index = SweepAndPrune(np.broadcast_to(EMPTY_BOX, (capacity, 2, 2)).copy())
+        for polygon in polygons:
+            self.add(polygon)
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __contains__(self, obstacle_id):
+        return obstacle_id in self.slots
+
+    # Ids of the obstacles in the scene, in the order they were added
+    def ids(self):
+        return sorted(self.slots)
+
+    def polygon(self, obstacle_id):
+        slot = self.slots[obstacle_id]
+        return self.vertices[slot, :self.counts[slot]].copy()
+
+    def polygons(self):
+        return [self.polygon(i) for i in self.ids()]
+
+    # Adds a convex polygon and returns its id. A new obstacle starts the time step where it is (it does not move)
+    def add(self, polygon):
+        polygon = np.asarray(polygon, dtype=float).reshape(-1, 2)
+        if not self.free_slots:
+            self.grow_slots(2 * len(self.counts))
+        if len(polygon) > self.vertices.shape[1]:
+            self.grow_vertices(len(polygon))
+        slot = self.free_slots.pop()
+        obstacle_id = self.next_id
+        self.next_id += 1
+        self.slots[obstacle_id] = slot
+        self.slot_ids[slot] = obstacle_id
+        self.write(slot, polygon)
+        self.start[slot] = self.vertices[slot]
+        self.moved.discard(slot)
+        return obstacle_id
+
+    def remove(self, obstacle_id):
+        slot = self.slots.pop(obstacle_id)
+        self.slot_ids[slot] = -1
+        self.counts[slot] = 0
+        self.moved.discard(slot)
+        self.dirty.add(slot)
+        self.free_slots.append(slot)
+        self.version += 1
+
+    # Replaces an obstacle's vertices. With the same number of vertices the obstacle moves there over the current
+    # time step; otherwise it has no vertex correspondence to sweep and simply appears there
+    def set_polygon(self, obstacle_id, polygon):
+        polygon = np.asarray(polygon, dtype=float).reshape(-1, 2)
+        slot = self.slots[obstacle_id]
+        if len(polygon) > self.vertices.shape[1]:
+            self.grow_vertices(len(polygon))
+        same_shape = len(polygon) == self.counts[slot]
+        self.write(slot, polygon)
+        if same_shape:
+            self.moved.add(slot)
+        else:
+            self.start[slot] = self.vertices[slot]
+            self.moved.discard(slot)
+
+    # Rigid motion of many obstacles at once: rotation by angle degrees (counterclockwise, like the car) about
+    # each obstacle's vertex centroid, or about center if given, then translation by (dx, dy).
+    # ids is a sequence of ids and dx, dy, angle are scalars or one value per id
+    def transform(self, ids, dx=0.0, dy=0.0, angle=0.0, center=None):
+        slots = np.array([self.slots[i] for i in np.atleast_1d(ids)], dtype=np.int64)
+        if not len(slots):
+            return
+        dx, dy, angle = (np.broadcast_to(np.asarray(v, dtype=float), (len(slots),)) for v in (dx, dy, angle))
+        vertices = self.vertices[slots]
+        if center is None:
+            real = np.arange(vertices.shape[1]) < self.counts[slots][:, None]
+            center = (vertices * real[..., None]).sum(axis=1) / self.counts[slots][:, None]
+        center = np.broadcast_to(np.asarray(center, dtype=float), (len(slots), 2))[:, None, :]
+        c, s = np.cos(np.radians(angle))[:, None], np.sin(np.radians(angle))[:, None]
+        local = vertices - center
+        rotated = np.stack([local[..., 0] * c - local[..., 1] * s, local[..., 0] * s + local[..., 1] * c], axis=-1)
+        self.vertices[slots] = rotated + center + np.stack([dx, dy], axis=1)[:, None, :]
+        self.moved.update(slots.tolist())
+        self.dirty.update(slots.tolist())
+        self.version += 1
+
+    # Ends the time step: every obstacle's current position becomes its start position for the next one
+    def end_step(self):
+        if not self.moved:
+            return
+        moved = np.fromiter(self.moved, dtype=np.int64)
+        self.start[moved] = self.vertices[moved]
+        self.dirty.update(self.moved)
+        self.moved.clear()
+
+    # Furthest any point of any obstacle moves during the current time step
+    def max_motion(self):
+        if not self.moved:
+            return 0.0
+        moved = np.fromiter(self.moved, dtype=np.int64)
+        return float(np.linalg.norm(self.vertices[moved] - self.start[moved], axis=-1).max())
+
+    def write(self, slot, polygon):
+        self.vertices[slot, :len(polygon)] = polygon
+        self.vertices[slot, len(polygon):] = polygon[-1]
+        self.counts[slot] = len(polygon)
+        self.dirty.add(slot)
+        self.version += 1
+
+    # Doubling growth: the only time the indexes are rebuilt from scratch
+    def grow_slots(self, capacity):
+        extra = capacity - len(self.counts)
+        self.vertices = np.concatenate([self.vertices, np.zeros((extra,) + self.vertices.shape[1:])])
+        self.start = np.concatenate([self.start, np.zeros((extra,) + self.start.shape[1:])])
+        self.counts = np.concatenate([self.counts, np.zeros(extra, dtype=np.int64)])
+        self.slot_ids = np.concatenate([self.slot_ids, np.full(extra, -1, dtype=np.int64)])
+        self.free_slots = list(range(capacity - 1, len(self.counts) - extra - 1, -1)) + self.free_slots
+        boxes, swept = self.boxes(np.arange(capacity))
+        self.index, self.swept_index = SweepAndPrune(boxes), SweepAndPrune(swept)
+        self.dirty.clear()
+
+    def grow_vertices(self, num_vertices):
+        pad = num_vertices - self.vertices.shape[1]
+        self.vertices = np.concatenate([self.vertices, np.repeat(self.vertices[:, -1:], pad, axis=1)], axis=1)
+        self.start = np.concatenate([self.start, np.repeat(self.start[:, -1:], pad, axis=1)], axis=1)
+
+    # Bounding boxes of some slots at their current position and over their whole motion in this time step
+    def boxes(self, slots):
+        current = np.stack([self.vertices[slots].min(axis=1), self.vertices[slots].max(axis=1)], axis=1)
+        start = np.stack([self.start[slots].min(axis=1), self.start[slots].max(axis=1)], axis=1)
+        swept = np.stack([np.minimum(current[:, 0], start[:, 0]), np.maximum(current[:, 1], start[:, 1])], axis=1)
+        free = self.counts[slots] == 0
+        current[free] = swept[free] = EMPTY_BOX
+        return current, swept
+
+    # Brings both broad-phase indexes up to date with the slots changed since the last query
+    def sync(self):
+        if not self.dirty:
+            return
+        slots = np.fromiter(self.dirty, dtype=np.int64)
+        current, swept = self.boxes(slots)
+        self.index.update(slots, current)
+        self.swept_index.update(slots, swept)
+        self.dirty.clear()
+
+    # ObstacleSet over the current positions; query results index slots, which slot_ids maps back to ids
+    @property
+    def obstacles(self):
+        self.sync()
+        return ObstacleSet(self.vertices, self.index)
+
+    # Moving-obstacle versions of ObstacleSet.polygons_collide / circles_collide: each query shape is tested
+    # against the obstacles where they are at its time t in [0, 1] of the current step
+    def moving_polygons_collide(self, polygons, t):
+        polygons = np.asarray(polygons, dtype=float)
+        self.sync()
+        boxes = np.stack([polygons.min(axis=1), polygons.max(axis=1)], axis=1)
+        query, slot = self.swept_index.query_batch(boxes)
+        hits = SAT_Collides_batch(polygons[query], self.at_time(slot, np.asarray(t, dtype=float)[query]))
+        result = np.zeros(len(polygons), dtype=bool)
+        result[query[hits]] = True
+        return result
+
+    def moving_circles_collide(self, centers, radius, t):
+        centers = np.asarray(centers, dtype=float).reshape(-1, 2)
+        radius = np.broadcast_to(np.asarray(radius, dtype=float), (len(centers),))
+        self.sync()
+        boxes = np.stack([centers - radius[:, None], centers + radius[:, None]], axis=1)
+        query, slot = self.swept_index.query_batch(boxes)
+        obstacles = self.at_time(slot, np.asarray(t, dtype=float)[query])
+        hits = circle_poly_collides_batch(centers[query], radius[query], obstacles)
+        result = np.zeros(len(centers), dtype=bool)
+        result[query[hits]] = True
+        return result
+
+    def at_time(self, slots, t):
+        return self.start[slots] + t[:, None, None] * (self.vertices[slots] - self.start[slots])
+
+# Time of first contact in [0, 1] of car motions from start to end poses, (N, 3) arrays of (x, y, angle in
+# degrees), while the scene's obstacles move over the same time step. Same sampling as car_first_contact, with
+# the obstacles' motion added to every segment's motion bound; leaving the workspace bounds counts as contact
+def car_first_contact_moving(scene, start, end, width, height, tolerance=0.005, bounds=(0, 2, 0, 2)):
+    start, end = np.atleast_2d(np.asarray(start, dtype=float)), np.atleast_2d(np.asarray(end, dtype=float))
+    motion = car_motion_bound(start, end, width, height) + scene.max_motion()
+    segment, t, margin, early = sample_segments(motion, tolerance)
+    poses = start[segment] + t[:, None] * (end - start)[segment]
+    coords = inflate_rectangles(get_coords_batch(poses[:, 0], poses[:, 1], poses[:, 2], width, height), margin)
+    hits = ((coords[..., 0] < bounds[0]) | (coords[..., 0] > bounds[1]) |
+            (coords[..., 1] < bounds[2]) | (coords[..., 1] > bounds[3])).any(axis=1)
+    hits[~hits] = scene.moving_polygons_collide(coords[~hits], t[~hits])
+    return first_contact(segment, early, hits, len(start))
+
+# Same for arm motions between (theta1, theta2) configurations, (N, 2) arrays. start == end checks an arm that
+# holds still while the obstacles move
+def arm_first_contact_moving(arm, scene, start, end, tolerance=0.005):
+    start, end = np.atleast_2d(np.asarray(start, dtype=float)), np.atleast_2d(np.asarray(end, dtype=float))
+    motion = arm_motion_bound(arm, start, end) + scene.max_motion()
+    segment, t, margin, early = sample_segments(motion, tolerance)
+    thetas = start[segment] + t[:, None] * (end - start)[segment]
+    joints, rects = arm_geometry(arm, thetas[:, 0], thetas[:, 1])
+    joint_hits = scene.moving_circles_collide(joints.reshape(-1, 2), np.repeat(arm.rad + margin, 3), np.repeat(t, 3)).reshape(-1, 3)
+    rect_hits = scene.moving_polygons_collide(inflate_rectangles(rects.reshape(-1, 4, 2), np.repeat(margin, 2)), np.repeat(t, 2)).reshape(-1, 2)
+    hits = joint_hits.any(axis=1) | rect_hits.any(axis=1)
+    return first_contact(segment, early, hits, len(start))
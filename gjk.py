@@ -0,0 +1,185 @@
+import numpy as np
+
+# GJK distance and EPA penetration queries between convex shapes.
+# A shape is a convex polygon "core" (vertices in cyclic order) grown by a radius, so a polygon has radius 0,
+# a circle is a single core vertex with its radius, and rectangles are just 4-vertex polygons. GJK runs on the
+# cores and the radii are subtracted afterwards.
+# Queries can be warm-started: the result carries the vertex indices of the final simplex, and passing them back
+# on the next frame starts GJK (and the hill-climbing support search) from the features that were closest last
+# time, so for slowly moving shapes a query typically finishes after one or two support evaluations.
+
+class ConvexShape:
+    def __init__(self, vertices, radius=0.0):
+        self.vertices = np.asarray(vertices, dtype=float).reshape(-1, 2)
+        self.radius = radius
+
+    @classmethod
+    def circle(cls, center, radius):
+        return cls([center], radius)
+
+    # Index of the vertex furthest along direction d. With a hint (a vertex that was furthest along a similar
+    # direction) it hill-climbs around the polygon from there instead of scanning every vertex
+    def support(self, d, hint=None):
+        v = self.vertices
+        if hint is None or len(v) <= 8:
+            return int(np.argmax(v @ d))
+        n, i = len(v), hint
+        best = v[i] @ d
+        for step in (1, -1):
+            while True:
+                j = (i + step) % n
+                value = v[j] @ d
+                if value <= best: break
+                i, best = j, value
+        return i
+
+class GJKResult:
+    def __init__(self, distance, point_a, point_b, simplex, normal=None):
+        self.distance = distance # Negative distances are penetration depths
+        self.point_a = point_a # Witness points (closest points, or deepest points when penetrating)
+        self.point_b = point_b
+        self.simplex = simplex # [(index in A, index in B), ...], pass back as warm_start next time
+        self.normal = normal # Unit direction from A to B (separating) or to push B out of A (penetrating)
+
+    @property
+    def collides(self):
+        return self.distance <= 0
+
+# Closest point to the origin on a simplex of Minkowski-difference points. Returns the barycentric weights of the
+# points that are kept (the minimal sub-simplex) and whether the origin is inside the triangle
+def closest_on_simplex(points):
+    if len(points) == 1:
+        return [0], [1.0], False
+    if len(points) == 2:
+        a, b = points
+        ab = b - a
+        denom = ab @ ab
+        t = 0.0 if denom == 0 else -(a @ ab) / denom
+        if t <= 0: return [0], [1.0], False
+        if t >= 1: return [1], [1.0], False
+        return [0, 1], [1 - t, t], False
+    a, b, c = points
+    area = (b[0]-a[0])*(c[1]-a[1]) - (b[1]-a[1])*(c[0]-a[0])
+    if area != 0:
+        wa = (b[0]*c[1] - b[1]*c[0]) / area
+        wb = (c[0]*a[1] - c[1]*a[0]) / area
+        wc = 1 - wa - wb
+        if wa >= 0 and wb >= 0 and wc >= 0:
+            return [0, 1, 2], [wa, wb, wc], True
+    best = None
+    for pair in ((0, 1), (1, 2), (0, 2)):
+        keep, weights, _ = closest_on_simplex([points[pair[0]], points[pair[1]]])
+        point = sum(w * points[pair[k]] for k, w in zip(keep, weights))
+        if best is None or point @ point < best[0]:
+            best = (point @ point, [pair[k] for k in keep], weights)
+    return best[1], best[2], False
+
+# Distance between two convex shapes (negative = penetration depth, computed with EPA).
+# warm_start is the simplex of a previous result for the same pair of shapes
+def gjk_distance(shape_a, shape_b, warm_start=None, max_iterations=64, eps=1e-10):
+    A, B = shape_a.vertices, shape_b.vertices
+    simplex = list(warm_start) if warm_start else [(0, 0)]
+    hint_a, hint_b = simplex[-1]
+    simplex = [(i % len(A), j % len(B)) for i, j in simplex]
+    weights, inside = [1.0], False
+    for _ in range(max_iterations):
+        points = [A[i] - B[j] for i, j in simplex]
+        keep, weights, inside = closest_on_simplex(points)
+        simplex = [simplex[k] for k in keep]
+        if inside: break
+        v = sum(w * points[k] for k, w in zip(keep, weights))
+        if v @ v <= eps: break
+        i = shape_a.support(-v, hint_a)
+        j = shape_b.support(v, hint_b)
+        hint_a, hint_b = i, j
+        w = A[i] - B[j]
+        # Stop once the new support point brings the simplex no closer to the origin
+        if (i, j) in simplex or v @ v - v @ w <= eps * max(v @ v, 1.0):
+            break
+        simplex.append((i, j))
+    else:
+        simplex = simplex[:len(weights)] # Ran out of iterations, drop the support point added last
+    point_a = sum(w * A[i] for (i, _), w in zip(simplex, weights))
+    point_b = sum(w * B[j] for (_, j), w in zip(simplex, weights))
+    gap = point_b - point_a
+    core_distance = np.sqrt(gap @ gap)
+    radii = shape_a.radius + shape_b.radius
+    if not inside and core_distance > eps:
+        normal = gap / core_distance
+        return GJKResult(core_distance - radii, point_a + normal * shape_a.radius,
+                         point_b - normal * shape_b.radius, simplex, normal)
+    depth, normal = epa(shape_a, shape_b, simplex)
+    return GJKResult(-(depth + radii), point_a, point_b, simplex, normal)
+
+# Counter-clockwise convex hull of a few 2D points (Andrew's monotone chain)
+def hull_ccw(points):
+    points = sorted({(float(x), float(y)) for x, y in points})
+    if len(points) < 3:
+        return [np.array(p) for p in points]
+    cross = lambda o, a, b: (a[0]-o[0])*(b[1]-o[1]) - (a[1]-o[1])*(b[0]-o[0])
+    lower, upper = [], []
+    for p in points:
+        while len(lower) >= 2 and cross(lower[-2], lower[-1], p) <= 0: lower.pop()
+        lower.append(p)
+    for p in reversed(points):
+        while len(upper) >= 2 and cross(upper[-2], upper[-1], p) <= 0: upper.pop()
+        upper.append(p)
+    return [np.array(p) for p in lower[:-1] + upper[:-1]]
+
+# Expanding polytope algorithm: penetration depth and direction of two overlapping polygon cores.
+# Starts from the hull of the GJK simplex (which contains the origin) plus support points in a few directions,
+# and grows it toward the closest edge until the boundary of the Minkowski difference is reached
+def epa(shape_a, shape_b, simplex, max_iterations=64, eps=1e-10):
+    A, B = shape_a.vertices, shape_b.vertices
+    support = lambda d: A[shape_a.support(d)] - B[shape_b.support(-d)]
+    directions = [np.array([np.cos(a), np.sin(a)]) for a in np.arange(8) * np.pi / 4]
+    polytope = hull_ccw([A[i] - B[j] for i, j in simplex] + [support(d) for d in directions])
+    if len(polytope) < 3:
+        return 0.0, np.array([1.0, 0.0]) # Degenerate (touching) cores
+    for _ in range(max_iterations):
+        best = None
+        for k in range(len(polytope)):
+            p, q = polytope[k], polytope[(k + 1) % len(polytope)]
+            edge = q - p
+            length = np.hypot(*edge)
+            if length == 0: continue
+            normal = np.array([edge[1], -edge[0]]) / length
+            dist = normal @ p
+            if best is None or dist < best[0]:
+                best = (dist, normal)
+        dist, normal = best
+        w = support(normal)
+        if w @ normal - dist <= eps:
+            return max(dist, 0.0), normal
+        polytope = hull_ccw(polytope + [w])
+    return max(dist, 0.0), normal
+
+# Keeps warm-start simplices between frames for many (robot part, obstacle) pairs and answers clearance queries
+class GJKCache:
+    def __init__(self):
+        self.simplices = {}
+
+    def distance(self, key, shape_a, shape_b):
+        result = gjk_distance(shape_a, shape_b, self.simplices.get(key))
+        self.simplices[key] = result.simplex
+        return result
+
+    # Smallest distance between the parts and the obstacles (all ConvexShape) over the (part indices, obstacle
+    # indices) pairs, every pair by default. bounds are lower bounds on each pair's distance (e.g. the gap between
+    # their bounding boxes): pairs are visited nearest bound first and the search ends once no remaining pair can be
+    # closer (a zero bound never ends it, as such pairs may still overlap more deeply). It also ends as soon as a distance <= stop is found, which is then returned instead of the smallest one
+    def clearance(self, parts, obstacles, pairs=None, bounds=None, stop=-np.inf):
+        if pairs is None:
+            pairs = np.divmod(np.arange(len(parts) * len(obstacles)), len(obstacles))
+        part_ids, obstacle_ids = pairs
+        order = range(len(part_ids)) if bounds is None else np.argsort(bounds, kind='stable')
+        best = np.inf
+        for k in order:
+            if bounds is not None and bounds[k] > 0 and bounds[k] >= best: break
+            p, o = int(part_ids[k]), int(obstacle_ids[k])
+            best = min(best, self.distance((p, o), parts[p], obstacles[o]).distance)
+            if best <= stop: break
+        return best
+
+    def clear(self):
+        self.simplices.clear()
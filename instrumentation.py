@@ -0,0 +1,107 @@
+import json
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+# Runtime-switchable counters and stage timers for the collision pipeline.
+# Instrumented code checks the module-level `enabled` flag before doing any bookkeeping, so when instrumentation
+# is off (the default) the only cost is that attribute check:
+#
+#     if instrumentation.enabled: instrumentation.count('narrow_phase_calls')
+#
+#     start = instrumentation.start()
+#     ...
+#     instrumentation.stop('broad_phase', start)
+#
+# Counters used by the pipeline:
+#   aabb_tests                 box/box overlap tests done by the broad-phase
+#   broad_phase_hits           box pairs that overlapped and were passed on
+#   narrow_phase_calls         polygon/polygon and circle/polygon exact tests
+#   narrow_phase_early_exits   exact tests that found a separating axis
+#   cache_hits, cache_misses   lookups in a CollisionCache
+# Timers (total seconds and number of calls per stage) are keyed by stage name, e.g. 'broad_phase',
+# 'narrow_phase', 'check_arm_collisions', 'check_car'.
+# Exporters are callables that receive snapshot() whenever export() is called or a profile() block ends.
+# Updates and snapshots hold a lock, so calls running concurrently (e.g. in check_many's thread pool) count correctly.
+
+enabled = False
+counters = defaultdict(int)
+timings = defaultdict(float)
+timing_calls = defaultdict(int)
+exporters = []
+lock = threading.Lock()
+
+def enable():
+    global enabled
+    enabled = True
+
+def disable():
+    global enabled
+    enabled = False
+
+def reset():
+    with lock:
+        counters.clear()
+        timings.clear()
+        timing_calls.clear()
+
+def count(name, n=1):
+    with lock:
+        counters[name] += int(n)
+
+# Returns a start time for stop(), or None when instrumentation is off
+def start():
+    return time.perf_counter() if enabled else None
+
+def stop(stage, started):
+    if started is not None:
+        elapsed = time.perf_counter() - started
+        with lock:
+            timings[stage] += elapsed
+            timing_calls[stage] += 1
+
+def snapshot():
+    with lock:
+        return {'counters': dict(counters),
+                'timings': {stage: {'seconds': timings[stage], 'calls': timing_calls[stage]} for stage in timings}}
+
+def add_exporter(exporter):
+    exporters.append(exporter)
+
+def remove_exporter(exporter):
+    exporters.remove(exporter)
+
+def export():
+    data = snapshot()
+    for exporter in exporters:
+        exporter(data)
+    return data
+
+# Instruments everything inside the block from a clean slate, then exports and restores the previous state
+#     with instrumentation.profile() as stats: arm.check_arm_collisions()
+@contextmanager
+def profile():
+    was_enabled = enabled
+    reset()
+    enable()
+    stats = {}
+    try:
+        yield stats
+    finally:
+        if not was_enabled: disable()
+        stats.update(export())
+
+# Exporter that prints a short report
+def print_exporter(data):
+    for name, value in sorted(data['counters'].items()):
+        print(f"{name:28s} {value}")
+    for stage, t in sorted(data['timings'].items()):
+        print(f"{stage:28s} {t['seconds']*1e3:.3f} ms over {t['calls']} calls")
+
+# Exporter factory that appends one JSON line per export to a file
+def json_lines_exporter(filename):
+    def exporter(data):
+        with open(filename, 'a') as f:
+            f.write(json.dumps(data) + '\n')
+    return exporter
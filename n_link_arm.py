@@ -0,0 +1,80 @@
+import numpy as np
+from c_space import ObstacleSet, as_obstacle_set
+
+# Planar arm with any number of links, each with its own length and width, and a joint circle (with its own radius)
+# at the base, between links and at the tip. Same geometry as Arm_Controller: link i starts at the edge of joint i,
+# runs along its heading for lengths[i] and ends at the edge of joint i+1, so with two links, equal radii and
+# relative=False it reproduces the two-link arm exactly.
+# Configurations are (N, dof) arrays of joint angles in radians. With relative=True (the default) each angle is
+# measured from the previous link's heading, otherwise every angle is an absolute heading like theta1/theta2.
+# Everything is computed for the whole batch at once: headings and joint positions are cumulative sums over the
+# links, so there is no per-link or per-configuration Python loop.
+
+class NLinkArm:
+    def __init__(self, lengths, widths=0.1, radii=0.05, base=(1, 1), relative=True, polygons=()):
+        self.lengths = np.asarray(lengths, dtype=float).ravel()
+        self.widths = np.broadcast_to(np.asarray(widths, dtype=float), self.lengths.shape).copy()
+        self.radii = np.broadcast_to(np.asarray(radii, dtype=float), (self.dof + 1,)).copy()
+        self.base = np.asarray(base, dtype=float)
+        self.relative = relative
+        self.set_obs(polygons)
+
+    @property
+    def dof(self):
+        return len(self.lengths)
+
+    def set_obs(self, polygons):
+        self.polygons = polygons
+        self.obstacles = ObstacleSet(polygons)
+
+    # (N, dof) absolute link headings for (N, dof) joint angles (a single configuration may be passed as (dof,))
+    def headings(self, thetas):
+        thetas = np.asarray(thetas, dtype=float).reshape(-1, self.dof)
+        return np.cumsum(thetas, axis=1) if self.relative else thetas
+
+    # Joint centers (N, dof+1, 2) and link rectangles (N, dof, 4, 2) for a batch of configurations.
+    # Rectangle corners are in the same order as Arm_Controller.get_rect_vertices
+    def forward_kinematics(self, thetas):
+        headings = self.headings(thetas)
+        direction = np.stack([np.cos(headings), np.sin(headings)], axis=-1)
+        normal = np.stack([-direction[..., 1], direction[..., 0]], axis=-1)
+        reach = self.radii[:-1] + self.lengths + self.radii[1:] # Center-to-center distance along each link
+        steps = reach[:, None] * direction
+        joints = np.concatenate([np.zeros_like(steps[:, :1]), np.cumsum(steps, axis=1)], axis=1) + self.base
+        anchors = joints[:, :-1] + self.radii[:-1, None] * direction + (self.widths / 2)[:, None] * normal
+        across = -self.widths[:, None] * normal
+        along = self.lengths[:, None] * direction
+        rects = np.stack([anchors, anchors + across, anchors + across + along, anchors + along], axis=2)
+        return joints, rects
+
+    # Per-part collisions for a batch of configurations: (N, 2*dof+1) booleans, all joints (base first) then all
+    # links, the same layout as check_arm_collisions/arm_collisions. Configurations are done in chunks to bound memory
+    def collisions(self, thetas, obstacles=None, chunk_size=1 << 14):
+        obstacles = self.obstacles if obstacles is None else as_obstacle_set(obstacles)
+        thetas = np.asarray(thetas, dtype=float).reshape(-1, self.dof)
+        result = np.zeros((len(thetas), 2 * self.dof + 1), dtype=bool)
+        for start in range(0, len(thetas), chunk_size):
+            joints, rects = self.forward_kinematics(thetas[start:start+chunk_size])
+            n = len(joints)
+            radii = np.broadcast_to(self.radii, (n, self.dof + 1))
+            result[start:start+n, :self.dof+1] = obstacles.circles_collide(joints.reshape(-1, 2), radii.ravel()).reshape(n, -1)
+            result[start:start+n, self.dof+1:] = obstacles.polygons_collide(rects.reshape(-1, 4, 2)).reshape(n, -1)
+        return result
+
+    # (N,) True where any part of the arm hits an obstacle.
+    # Parts are tested from the base outward and each part only for the configurations that are still free
+    def collides(self, thetas, obstacles=None, chunk_size=1 << 14):
+        obstacles = self.obstacles if obstacles is None else as_obstacle_set(obstacles)
+        thetas = np.asarray(thetas, dtype=float).reshape(-1, self.dof)
+        result = np.zeros(len(thetas), dtype=bool)
+        for start in range(0, len(thetas), chunk_size):
+            joints, rects = self.forward_kinematics(thetas[start:start+chunk_size])
+            free = np.ones(len(joints), dtype=bool)
+            for k in range(self.dof + 1):
+                alive = np.flatnonzero(free)
+                free[alive] = ~obstacles.circles_collide(joints[alive, k], self.radii[k])
+                if k < self.dof:
+                    alive = np.flatnonzero(free)
+                    free[alive] = ~obstacles.polygons_collide(rects[alive, k])
+            result[start:start+len(joints)] = ~free
+        return result
@@ -1,9 +1,16 @@
-from create_scene import create_plot, make_polygons, show_scene, add_polygon_to_scene,load_polygons
-from collision_checking import bound_circle,bound_polygons,check_box_collision, circle_poly_collides, SAT_Collides
-import matplotlib.patches as patches
+from create_scene import create_plot, make_polygons, show_scene, load_polygons
+from collision_checking import bound_circle,bound_polygons, circle_poly_collides, SAT_Collides, frame_gaps
+from broad_phase import SweepAndPrune
+from c_space import ObstacleSet, arm_c_space, arm_geometry
+from adaptive_c_space import arm_adaptive_c_space
+from tiled_c_space import arm_job
+from c_space_cache import CSpaceCache
+from continuous_collision import arm_first_contact, arm_motion_bound, sweep_tolerance
+from gjk import ConvexShape, GJKCache
+from collision_cache import CollisionCache
+from scene_store import PolygonStore
+import instrumentation
 from numpy import cos, sin, degrees, pi, radians
-import matplotlib.pyplot as plt
-import matplotlib.colors as mcolors
 import numpy as np
 
 # This class is used to control the planar arm using keyboard input
@@ -45,27 +52,35 @@ class Arm_Controller:
         self.joint2 = Arm_Controller.compute_circle_center(self.theta1, self.joint1, self.rad, self.rlen1)
         self.anchor2 = Arm_Controller.compute_rect_anchor(self.theta2, self.joint2, self.rad, self.rwid)
         self.joint3 = Arm_Controller.compute_circle_center(self.theta2,self.joint2,self.rad, self.rlen2)
-        self.polygons=polygons
+        self.renderer = None # Created on first draw, only when there is an axis to draw on
+        self.collision_cache = None # Opt in with enable_collision_cache
+        self.set_arm_obs(polygons)
 
+    # Creates the renderer with the obstacles as its background and the five arm patches as its moving artists
+    def init_renderer(self):
+        import matplotlib.patches as patches
+        from rendering import SceneRenderer
+        self.renderer = SceneRenderer(self.ax, self.polygons)
+        self.arm_patches = [self.renderer.add(patches.Circle(self.joint1, self.rad, fill=True, color='b')),
+                            self.renderer.add(patches.Circle(self.joint2, self.rad, fill=True, color='b')),
+                            self.renderer.add(patches.Circle(self.joint3, self.rad, fill=True, color='b')),
+                            self.renderer.add(patches.Rectangle(self.anchor1, self.rwid, self.rlen1, fill=True, color='g')),
+                            self.renderer.add(patches.Rectangle(self.anchor2, self.rwid, self.rlen2, fill=True, color='g'))]
 
+    # Moves the existing arm patches to the current pose and blits them; nothing else is redrawn
     def draw_arm(self, collisions=[False]*5):
-        joint1 = patches.Circle(self.joint1, self.rad, fill=True, color='b')
-        rect1 = patches.Rectangle(self.anchor1,self.rwid,self.rlen1, fill=True,color='g')
+        if self.renderer is None: self.init_renderer()
+        joint1, joint2, joint3, rect1, rect2 = self.arm_patches
+        joint1.set_center(self.joint1)
+        joint2.set_center(self.joint2)
+        joint3.set_center(self.joint3)
+        rect1.set_xy(self.anchor1)
         rect1.set_angle(degrees(self.theta1 - pi/2))
-        joint2 = patches.Circle(self.joint2,self.rad, fill=True,color='b')
-        rect2 = patches.Rectangle(self.anchor2,self.rwid, self.rlen2, fill=True,color='g')
+        rect2.set_xy(self.anchor2)
         rect2.set_angle(degrees(self.theta2 - pi/2))
-        joint3 = patches.Circle(self.joint3,self.rad,fill=True,color='b')
-        all_comp = [joint1,joint2,joint3,rect1,rect2]
-        for i in range(len(collisions)):
-            if collisions[i]:
-                all_comp[i].set_color('r')
-        self.ax.add_patch(joint1)
-        self.ax.add_patch(rect1)
-        self.ax.add_patch(joint2)
-        self.ax.add_patch(rect2)
-        self.ax.add_patch(joint3)
-        show_scene(self.ax)
+        for i, patch in enumerate(self.arm_patches):
+            patch.set_color('r' if i < len(collisions) and collisions[i] else ('b' if i < 3 else 'g'))
+        self.renderer.update()
 
     # Call this function when angles are changed to recompute the position of the anchors and joints
     def re_orient(self):
@@ -77,39 +92,44 @@ class Arm_Controller:
     # On arrow key click change either theta 1 or theta 2 by 5 degrees
     def on_key(self, event):
         collisions = []
+        start = (self.theta1, self.theta2)
         if event.key == 'left':
             self.theta1 -= radians(5)
-            self.re_orient()
-            collisions = self.check_arm_collisions()
-            if any(collisions): self.theta1 += radians(5) # Reset if new theta causes an issue
         elif event.key == 'right':
             self.theta1 += radians(5)
-            self.re_orient()
-            collisions = self.check_arm_collisions()
-            if any(collisions): self.theta1 -= radians(5)
         elif event.key == 'up':
             self.theta2 += radians(5)
-            self.re_orient()
-            collisions = self.check_arm_collisions()
-            if any(collisions): self.theta2 -= radians(5)
         elif event.key == 'down':
             self.theta2 -= radians(5)
+        end = (self.theta1, self.theta2)
+        if end != start:
             self.re_orient()
-            collisions = self.check_arm_collisions()
-            if any(collisions): self.theta2 += radians(5)
+            # The clearance at the start both lets a step far from every obstacle skip the full checks and sets how
+            # finely the sweep is sampled otherwise
+            clearance, motion = self.step_clearance(start, end)
+            if clearance > motion:
+                collisions = [False]*5
+            else:
+                collisions = self.check_arm_collisions()
+                # Also check the sweep between the two poses so the arm can't pass through thin obstacles; it is sampled
+                # finer than the arm's clearance at the start, so the arm can always move away from an obstacle it is close to
+                tolerance = sweep_tolerance(clearance)
+                if any(collisions) or not np.isinf(arm_first_contact(self, start, end, self.obs_set, tolerance)[0]):
+                    self.theta1, self.theta2 = start # Reset if new theta causes an issue
+                    self.re_orient()
         
-        # Clear the current axis and redraw the arm
-        self.ax.cla()
+        # Only the arm is redrawn, the obstacles stay in the cached background
         self.draw_arm(collisions=collisions)
-        self.set_obs_plot()
-        self.ax.figure.canvas.draw()
 
-    #TODO: Implement avoid_init_collisions that detects collisions when arm has theta1, theta2 = 0 and removes those obstacles
+    # Removes the obstacles the arm hits at theta1, theta2 = 0, found by index rather than by comparing polygons
     def avoid_init_collisions(self):
         self.theta1,self.theta2 = 0,0
-        colliding_polygons = self.check_arm_collisions(True)
-        self.polygons = [poly for poly in self.polygons if not any(np.array_equal(poly, coll_poly) for coll_poly in colliding_polygons)]
-        self.polygons = np.array(self.polygons, dtype=object)
+        keep = np.ones(len(self.polygons), dtype=bool)
+        keep[self.compute_arm_collisions(signal=True, indices=True)] = False
+        if isinstance(self.polygons, PolygonStore):
+            self.set_arm_obs(self.polygons.subset(np.flatnonzero(keep)))
+        else:
+            self.set_arm_obs(np.array([poly for poly, k in zip(self.polygons, keep) if k], dtype=object))
 
     # Helper method that computes rectangle vertices and returns a np array so we can treat it as a polygon, angle in radians
     @staticmethod
@@ -127,68 +147,118 @@ class Arm_Controller:
         rectangle = rotated_corners + anchor
         return rectangle
     
+    # Vectorized get_rect_vertices: anchors (N, 2) and angles (N,) -> rectangles (N, 4, 2)
+    @staticmethod
+    def get_rect_vertices_batch(anchors, width, height, angles):
+        corners = np.array([[0,0], [width, 0], [width, height], [0, height]], dtype=float)
+        c, s = np.cos(angles)[:, None], np.sin(angles)[:, None]
+        x = corners[:, 0] * c - corners[:, 1] * s
+        y = corners[:, 0] * s + corners[:, 1] * c
+        return np.stack([x, y], axis=-1) + np.asarray(anchors, dtype=float)[:, None, :]
+    
+    # Sets the obstacles and builds the broad-phase index over their bounding boxes once
     def set_arm_obs(self,polygons):
         self.polygons=polygons
+        self.obs_index = SweepAndPrune(bound_polygons(polygons))
+        self.obs_set = ObstacleSet(polygons, self.obs_index) # Padded once for the batched and swept checks
+        self.obs_shapes = [ConvexShape(p) for p in polygons]
+        self.gjk_cache = GJKCache() # Warm-started distances to nearby obstacles between key presses
+        self.sdf = None # A distance field built for the old obstacles no longer applies
+        if self.renderer is not None: self.renderer.set_obstacles(polygons)
+        if self.collision_cache is not None: self.collision_cache.bind(polygons)
+
+    # Memoizes check_arm_collisions on (theta1, theta2) quantized to `resolution` radians; see collision_cache.py
+    def enable_collision_cache(self, resolution=1e-3, max_size=100000):
+        self.collision_cache = CollisionCache(resolution, max_size)
+        self.collision_cache.bind(self.polygons)
+        return self.collision_cache
+
+    # Optional signed distance field of the obstacles; parts it proves clear skip the narrow phase
+    def set_distance_field(self, sdf):
+        self.sdf = sdf
+
+    # Cheap test that skips the full checks for a step: it is clear if every obstacle near the arm is farther away
+    # than any point of the arm can move between the two (theta1, theta2) configurations
+    def step_is_clear(self, start, end):
+        clearance, motion = self.step_clearance(start, end, stop=True)
+        return clearance > motion
+
+    # Distance from the arm at start to the obstacles it could reach on the way to end (np.inf if there are none),
+    # and how far any point of the arm moves on the way. Each part is only measured against the obstacles its own
+    # grown box hits, those closest to it (by frame_gaps) first, so the search usually ends after a few GJK queries.
+    # With stop it ends at the first distance <= motion, which answers step_is_clear but may not be the smallest one
+    def step_clearance(self, start, end, stop=False):
+        motion = arm_motion_bound(self, start, end)[0]
+        joints, rects = arm_geometry(self, *start)
+        parts = [ConvexShape.circle(j, self.rad) for j in joints[0]] + [ConvexShape(r) for r in rects[0]]
+        # Joints are bounded by their boxes' corners, links by their own outlines
+        outlines = np.concatenate([joints[0][:, None] + self.rad * np.array([[-1, -1], [1, -1], [1, 1], [-1, 1]]), rects[0]])
+        boxes = np.stack([outlines.min(axis=1), outlines.max(axis=1)], axis=1)
+        part, obstacle = self.obs_index.query_batch(boxes + np.array([[-motion], [motion]]))
+        bounds = frame_gaps(outlines[part], self.obs_set.padded[obstacle])
+        return self.gjk_cache.clearance(parts, self.obs_shapes, (part, obstacle), bounds, motion if stop else -np.inf), motion
     
     def set_obs_plot(self):
-        for p in self.polygons:
-            add_polygon_to_scene(p,self.ax,False)
+        if self.renderer is None: self.init_renderer()
+        else: self.renderer.set_obstacles(self.polygons)
 
 
     def check_arm_collisions(self, signal=False):
+        if self.collision_cache is None or signal:
+            return self.compute_arm_collisions(signal)
+        return list(self.collision_cache.get((self.theta1, self.theta2), self.compute_arm_collisions))
+
+    # With signal, returns the obstacles that were hit instead of the per-part flags (their indices with indices=True)
+    def compute_arm_collisions(self, signal=False, indices=False):
+        started = instrumentation.start()
         circles = [self.joint1,self.joint2,self.joint3]
         rectangles = np.array([Arm_Controller.get_rect_vertices(self.anchor1,self.rwid,self.rlen1,self.theta1 - pi/2),
                       Arm_Controller.get_rect_vertices(self.anchor2,self.rwid,self.rlen2,self.theta2-pi/2)])
         #Broad-Phase
         circ_boxes = np.array([bound_circle(circle, self.rad) for circle in circles])
         rec_boxes = bound_polygons(rectangles)
-        poly_boxes = bound_polygons(self.polygons)
-        possible_circle_collisions = []
-        possible_rect_collisions = []
-        for i in range(len(circ_boxes)):
-            for j in range(len(poly_boxes)):
-                if check_box_collision(circ_boxes[i], poly_boxes[j]):
-                    possible_circle_collisions.append((circles[i], self.polygons[j]))
-
-        for i in range(len(rec_boxes)):
-            for j in range(len(poly_boxes)):
-                if check_box_collision(rec_boxes[i], poly_boxes[j]):
-                    possible_rect_collisions.append((rectangles[i],self.polygons[j]))
-        colliding_polygons = []
+        circ_hits = self.obs_index.query_batch(circ_boxes)
+        rect_hits = self.obs_index.query_batch(rec_boxes)
+        if self.sdf is not None:
+            # Joints are discs and each link lies inside the capsule around its center line with radius rwid/2
+            joint_free = self.sdf.discs_free(circles, self.rad)
+            rect_free = self.sdf.capsules_free((rectangles[:,0]+rectangles[:,1])/2, (rectangles[:,2]+rectangles[:,3])/2, self.rwid/2)
+            circ_hits = tuple(h[~joint_free[circ_hits[0]]] for h in circ_hits)
+            rect_hits = tuple(h[~rect_free[rect_hits[0]]] for h in rect_hits)
+        colliding = [] # Indices into self.polygons of the obstacles that were hit
         # Using SAT for finer collision checking
+        narrow_started = instrumentation.start()
         joint_coll = [False]*3 #Keep track of which of joints collided
-        for coll in possible_circle_collisions:
-            circle,polygon = coll
-            if circle_poly_collides(circle,self.rad,polygon):
-                colliding_polygons.append(polygon)
-                if self.joint1 == circle: joint_coll[0]=True
-                elif self.joint2 == circle: joint_coll[1]=True
-                elif self.joint3 == circle: joint_coll[2]=True
+        for i, j in zip(*circ_hits):
+            if circle_poly_collides(circles[i],self.rad,self.polygons[j]):
+                colliding.append(j)
+                joint_coll[i]=True
         
         arm_coll = [False] * 2 #Which rectangles collided
-        for coll in possible_rect_collisions:
-            rect,polygon = coll
-            if SAT_Collides(rect,polygon):
-                colliding_polygons.append(polygon)
-                if np.array_equal(rect,rectangles[0]):arm_coll[0]=True
-                elif np.array_equal(rect,rectangles[1]):arm_coll[1]=True
+        for i, j in zip(*rect_hits):
+            if SAT_Collides(rectangles[i],self.polygons[j]):
+                colliding.append(j)
+                arm_coll[i]=True
+        instrumentation.stop('narrow_phase', narrow_started)
+        instrumentation.stop('check_arm_collisions', started)
         if signal:
-            return colliding_polygons
+            return colliding if indices else [self.polygons[j] for j in colliding]
         return joint_coll+arm_coll #First 3 booleans indicate if any of the joints collided, last 2 indicate if arms collided
 
         
-    def create_c_space(self):
-        occupancy_grid = np.zeros((100,100))
-
-        angles = np.linspace(-pi,pi, 100)
-
-        for i, theta1 in enumerate(angles):
-            for j, theta2 in enumerate(angles):
-                self.theta1,self.theta2=theta1,theta2
-                self.re_orient()
-                if any(self.check_arm_collisions()):
-                    occupancy_grid[i][j] = 1
+    # Computes the occupancy grid with the vectorized c-space engine (the arm's current pose is left untouched) and plots it.
+    # adaptive=True builds it from a quadtree that only refines cells along obstacle boundaries (same grid, fewer checks).
+    # With a cache_dir the grid is looked up in (and added to) the on-disk c-space cache for these obstacles and this arm
+    def create_c_space(self, resolution=100, theta1_range=(-pi, pi), theta2_range=(-pi, pi), adaptive=False, cache_dir=None):
+        if cache_dir is not None:
+            occupancy_grid = CSpaceCache(cache_dir).get(arm_job(self, resolution, theta1_range, theta2_range), self.polygons).to_dense()
+        elif adaptive:
+            occupancy_grid = arm_adaptive_c_space(self, resolution, theta1_range, theta2_range).to_dense()
+        else:
+            occupancy_grid = arm_c_space(self, resolution, theta1_range, theta2_range)
 
+        import matplotlib.pyplot as plt
+        import matplotlib.colors as mcolors
         #Custom colormap where 0 is purple, 1 is yellow
         colors = [(0.0, 'purple'), (1.0, 'yellow')]
         cmap = mcolors.LinearSegmentedColormap.from_list("custom_colormap", colors)
@@ -198,11 +268,13 @@ class Arm_Controller:
         plt.ylabel("Theta 2")
         plt.title("Free C-Space")
         plt.show()
+        return occupancy_grid
 
 
 
 
 if __name__ == '__main__':
+    import matplotlib.pyplot as plt
     fig,ax = plt.subplots(dpi=100)
     arm = Arm_Controller(0, 0,ax)
     obstacles=load_polygons('arm_polygons.npy')
@@ -0,0 +1,93 @@
+import numpy as np
+from matplotlib.backend_bases import KeyEvent
+from matplotlib.collections import PolyCollection
+from matplotlib.patches import Patch
+
+# Fast redraws for the interactive controllers.
+# The obstacles are one PolyCollection that only changes when the scene does. After every full draw the axes
+# (obstacles, grid, ticks) are saved as a background image, and a frame then just restores that image and draws
+# the moving artists (arm links and joints, the car) on top of it, i.e. blitting.
+# The same path works with a non-interactive backend such as Agg, where frames are rendered off-screen and can
+# be collected and written out as a GIF:
+#
+#     renderer.record()           # after each step
+#     renderer.save_gif('run.gif')
+
+class SceneRenderer:
+    def __init__(self, ax, obstacles=(), fill=False, xlim=(0, 2), ylim=(0, 2)):
+        self.ax = ax
+        self.canvas = ax.figure.canvas
+        # Same look as add_polygon_to_scene
+        self.obstacles = PolyCollection([], closed=True, facecolors='black' if fill else 'none',
+                                        edgecolors='black', alpha=0.4)
+        self.set_obstacles(obstacles)
+        ax.add_collection(self.obstacles)
+        ax.set_xlim(*xlim)
+        ax.set_ylim(*ylim)
+        ax.set_aspect('equal', adjustable='box')
+        ax.grid(True)
+        self.artists = []
+        self.background = None
+        self.frames = []
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+
+    # Replaces the obstacles; the background is stale until the next full draw
+    def set_obstacles(self, obstacles):
+        self.obstacles.set_verts([np.asarray(p, dtype=float) for p in obstacles])
+        self.background = None
+
+    # Registers a moving artist: it is left out of full draws and redrawn on top of the background every frame
+    def add(self, artist):
+        artist.set_animated(True)
+        if isinstance(artist, Patch):
+            self.ax.add_patch(artist)
+        else:
+            self.ax.add_artist(artist)
+        self.artists.append(artist)
+        return artist
+
+    def on_draw(self, event):
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self.draw_artists()
+
+    def draw_artists(self):
+        for artist in self.artists:
+            self.ax.draw_artist(artist)
+
+    # Shows the current state of the moving artists, doing a full draw only when there is no valid background
+    def update(self):
+        if self.background is None:
+            self.canvas.draw()
+        else:
+            self.canvas.restore_region(self.background)
+            self.draw_artists()
+            self.canvas.blit(self.ax.bbox)
+        self.canvas.flush_events()
+
+    # RGB image of the figure as last rendered
+    def grab_frame(self):
+        if self.background is None:
+            self.update()
+        return np.asarray(self.canvas.buffer_rgba())[..., :3].copy()
+
+    def record(self):
+        self.frames.append(self.grab_frame())
+
+    # Frames share the palette of the first one, so only one adaptive quantization is needed for the whole GIF
+    def save_gif(self, filename, fps=10):
+        from PIL import Image
+        palette = Image.fromarray(self.frames[0]).quantize(colors=256)
+        images = [palette] + [Image.fromarray(frame).quantize(palette=palette, dither=0) for frame in self.frames[1:]]
+        images[0].save(filename, save_all=True, append_images=images[1:], duration=int(1000 / fps), loop=0)
+
+# Drives a controller's key handler with a sequence of keys ('left', 'up', ...) and records a frame after each one.
+# Use with the Agg backend to render a run without opening a window:
+#     replay_keys(arm.on_key, arm.renderer, ['left'] * 36, 'planararm.gif')
+def replay_keys(handler, renderer, keys, filename=None, fps=10):
+    renderer.record()
+    for key in keys:
+        handler(KeyEvent('key_press_event', renderer.canvas, key))
+        renderer.record()
+    if filename is not None:
+        renderer.save_gif(filename, fps)
+    return renderer.frames
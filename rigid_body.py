@@ -1,12 +1,14 @@
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
-from matplotlib.transforms import Affine2D
 import numpy as np
 from  create_scene import make_polygons, show_scene, create_plot, add_polygon_to_scene
-from collision_checking import collides
-import random
+from collision_checking import collides, bound_polygons, pad_polygons, frame_gaps
+from broad_phase import SweepAndPrune
+from car_geometry import get_coords_batch, car_pose
+from c_space import ObstacleSet, sample_free_car_poses
+from continuous_collision import car_first_contact, car_motion_bound, sweep_tolerance
+from gjk import ConvexShape, GJKCache
+from collision_cache import CollisionCache
+import instrumentation
 import math
-from scipy.spatial import ConvexHull
 
 #Controller to move the car using keyboard inputs
 class CarController:
@@ -15,52 +17,94 @@ class CarController:
         self.car = car
         self.x, self.y = car.get_x, car.get_y
         self.ax = ax
-        self.obstacles = obstacles
-        self.ax.add_patch(car)
+        self.collision_cache = None # Opt in with enable_collision_cache
+        # Obstacles are drawn once into a cached background, only the car is redrawn on key presses
+        from rendering import SceneRenderer
+        self.renderer = SceneRenderer(ax, (), fill=True)
+        self.renderer.add(car)
+        self.set_obstacles(obstacles)
         self.degrees = car.get_angle
         self.fig = ax.figure
-        # Set the axis limits
-        self.ax.set_xlim(0, 2)
-        self.ax.set_ylim(0, 2)
         # Connsect the event to the callback function
         self.fig.canvas.mpl_connect('key_press_event', self.on_key_press)
 
+    # Replaces the obstacles, rebuilding everything derived from them
+    def set_obstacles(self, obstacles):
+        self.obstacles = obstacles
+        self.obs_index = SweepAndPrune(bound_polygons(obstacles))
+        self.obs_set = ObstacleSet(obstacles, self.obs_index)
+        self.obs_shapes = [ConvexShape(o) for o in obstacles]
+        self.gjk_cache = GJKCache() # Warm-started distances to nearby obstacles between key presses
+        self.renderer.set_obstacles(obstacles)
+        if self.collision_cache is not None: self.collision_cache.bind(obstacles)
+
+    # Memoizes is_free() on the car's quantized pose; see collision_cache.py. set_obstacles rebinds it
+    def enable_collision_cache(self, resolution=1e-3, max_size=100000):
+        self.collision_cache = CollisionCache(resolution, max_size)
+        self.collision_cache.bind(self.obstacles)
+        return self.collision_cache
+
+    # True if the car at pose (x, y, angle), or at its current pose, is clear of every obstacle
+    def is_free(self, pose=None):
+        car = self.car if pose is None else (*pose, self.car.get_width(), self.car.get_height())
+        return check_car(car, self.obstacles, self.obs_index, self.collision_cache)
+
     def on_key_press(self, event):
         # Define step size for arrow key movement
         step = 0.05
-        prev = ["x", 0, 0]
+        x, y, angle = self.car.get_x(), self.car.get_y(), self.degrees()
         if event.key == 'up':
-            y = step * math.sin(math.radians(self.degrees()))
-            self.car.set_y(self.car.get_y() + y)
-            x = step * math.cos(math.radians(self.degrees()))
-            self.car.set_x(self.car.get_x() + x)
-            prev = ["f", x, y]
+            x, y = x + step * math.cos(math.radians(angle)), y + step * math.sin(math.radians(angle))
         elif event.key == 'down':
-            y = step * math.sin(math.radians(self.degrees()))
-            self.car.set_y(self.car.get_y() - y)
-            x = step * math.cos(math.radians(self.degrees()))
-            self.car.set_x(self.car.get_x() - x)
-            prev = ["b", x, y]
+            x, y = x - step * math.cos(math.radians(angle)), y - step * math.sin(math.radians(angle))
         elif event.key == 'left':
-            self.car.set(angle = self.degrees() + 10)
-            prev = ["a", -10, 0]
+            angle += 10
         elif event.key == 'right':
-            self.car.set(angle = self.degrees() - 10)
-            prev = ["a", 10, 0]
-        if(not (check_car(self.car, self.obstacles) and check_boundary(self.car)) ): 
-            if prev[0] == "f": 
-                self.car.set_x(self.car.get_x() - prev[1]) 
-                self.car.set_y(self.car.get_y() - prev[2]) 
-            elif prev[0] == "a": self.car.set(angle = self.degrees() + prev[1])
-            else: 
-                self.car.set_x(self.car.get_x() + prev[1]) 
-                self.car.set_y(self.car.get_y() + prev[2]) 
+            angle -= 10
+        # Check the whole motion rather than just the end pose so the car can't tunnel through thin obstacles
+        # The sweep is sampled finer than the car's clearance at the start, so it can always back away from a wall.
+        # A step whose end pose is blocked is refused without sweeping; with the collision cache enabled, repeated
+        # presses against the same wall are answered from it
+        start, end = (self.car.get_x(), self.car.get_y(), self.degrees()), (x, y, angle)
+        clearance, motion = self.step_clearance(start, end)
+        if self.in_workspace(end) and clearance > motion or self.is_free(end) and \
+           np.isinf(car_first_contact(start, end, self.car.get_width(), self.car.get_height(), self.obs_set,
+                                      sweep_tolerance(clearance))[0]):
+            self.car.set_x(x)
+            self.car.set_y(y)
+            self.car.set(angle = angle)
             
         # Update the car's position
-        self.fig.canvas.draw()
+        self.renderer.update()
     
 
 
+    # True if the car at pose (x, y, angle) lies inside the workspace
+    def in_workspace(self, pose):
+        coords = get_coords_batch(*pose, self.car.get_width(), self.car.get_height())[0]
+        return not ((coords < 0).any() or (coords > 2).any())
+
+    # Cheap test that skips the swept check: the step is clear if every obstacle near the car is farther away than
+    # any point of the car can move and the end pose stays inside the workspace
+    def step_is_clear(self, start, end):
+        if not self.in_workspace(end):
+            return False
+        clearance, motion = self.step_clearance(start, end, stop=True)
+        return clearance > motion
+
+    # Distance from the car at start to the obstacles it could reach on the way to end (np.inf if there are none),
+    # and how far any point of the car moves on the way. Obstacles are measured closest (by frame_gaps) first, and
+    # with stop the search ends at the first distance <= motion (see Arm_Controller.step_clearance)
+    def step_clearance(self, start, end, stop=False):
+        width, height = self.car.get_width(), self.car.get_height()
+        motion = car_motion_bound(start, end, width, height)[0]
+        coords = get_coords_batch(*start, width, height)[0]
+        box = np.asarray(bound_polygons([coords]))
+        part, obstacle = self.obs_index.query_batch(box + np.array([[-motion], [motion]]))
+        bounds = frame_gaps(coords[None].repeat(len(part), axis=0), self.obs_set.padded[obstacle])
+        return self.gjk_cache.clearance([ConvexShape(coords)], self.obs_shapes, (part, obstacle), bounds,
+                                        motion if stop else -np.inf), motion
+
 def check_boundary(car):
     coords = get_coords(car)
     for x in coords:
@@ -70,50 +114,135 @@ def check_boundary(car):
             return False
     return True
     
-#Checks if the car collides with an obstacle
-def check_car(car, obstacles):
-    for polygon in obstacles:
-        if not collides(polygon, get_coords(car)): return False
-    return True
+#Checks if the car collides with an obstacle, only running SAT on obstacles whose boxes overlap the car's.
+#The car is a pose tuple (x, y, angle, width, height) or a Rectangle patch.
+#Pass a prebuilt index over the obstacles to avoid rebuilding it on every call, and a CollisionCache to memoize
+#answers by quantized pose. The cache must already be bound to these obstacles: bind it when they change
+#(CarController.set_obstacles does), binding on every call would hash the whole scene per query
+def check_car(car, obstacles, index=None, cache=None):
+    if cache is None:
+        return compute_check_car(car, obstacles, index)
+    return cache.get(car_pose(car), lambda: compute_check_car(car, obstacles, index))
 
-#Gets the coordinates for the car
-def get_coords(r1):
-    r = Affine2D().rotate_deg_around(r1.get_x(),r1.get_y(),r1.get_angle())
-    coords = np.array([r1.get_xy(), [r1.get_x()+r1.get_width(), r1.get_y()],
-                   [r1.get_x()+r1.get_width(), r1.get_y()+r1.get_height()],
-                   [r1.get_x(), r1.get_y()+r1.get_height()]]) 
+def compute_check_car(car, obstacles, index=None):
+    started = instrumentation.start()
+    if index is None: index = SweepAndPrune(bound_polygons(obstacles))
+    coords = get_coords(car)
+    free = all(collides(obstacles[i], coords) for i in index.query(bound_polygons([coords])[0]))
+    instrumentation.stop('check_car', started)
+    return free
 
-    return r.transform(coords)
+#Gets the coordinates for the car (pose tuple or Rectangle): corners rotated by angle around (x, y)
+def get_coords(r1):
+    return get_coords_batch(*car_pose(r1))[0]
 
+# Draws the C-obstacles of the car at its current angle: obstacle (+) (-car body), with the body taken relative
+# to the car's reference corner (x, y), so the car collides exactly when (x, y) lies inside one of them
 def collision_space(car, obstacles, ax):
-    print(car)
+    body = get_coords(car) - np.array(car_pose(car)[:2])
     for o in obstacles:
-        minkowski_sum_points = compute_minkowski_sum(car, o)
-        convex_hull = ConvexHull(minkowski_sum_points)
-        minkowski_sum_polygon = minkowski_sum_points[convex_hull.vertices]
-        add_polygon_to_scene(minkowski_sum_polygon, ax, False)
+        add_polygon_to_scene(compute_minkowski_sum(o, -body), ax, False)
 
+# Returns a convex polygon's vertices in counter-clockwise order, starting from its lowest (then leftmost) vertex
+def ccw_from_bottom(polygon):
+    polygon = np.asarray(polygon, dtype=float)
+    x, y = polygon[:, 0], polygon[:, 1]
+    if np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1)) < 0:
+        polygon = polygon[::-1]
+    start = np.lexsort((polygon[:, 0], polygon[:, 1]))[0]
+    return np.roll(polygon, -start, axis=0)
 
+# Minkowski sum of two convex polygons in O(n + m): walk both boundaries from their lowest vertices and
+# merge the edges in order of angle
 def compute_minkowski_sum(A, B):
+    A, B = ccw_from_bottom(A), ccw_from_bottom(B)
+    n, m = len(A), len(B)
+    A, B = np.vstack([A, A[:2]]), np.vstack([B, B[:2]])
     minkowski_sum = []
-    for a in A:
-        for b in B:
-            minkowski_sum.append(a + b)
+    i = j = 0
+    while i < n or j < m:
+        minkowski_sum.append(A[i] + B[j])
+        edge_a, edge_b = A[i+1] - A[i], B[j+1] - B[j]
+        cross = edge_a[0]*edge_b[1] - edge_a[1]*edge_b[0]
+        if cross >= 0 and i < n: i += 1
+        if cross <= 0 and j < m: j += 1
     return np.array(minkowski_sum)
+
+# Batched Minkowski sums of convex polygons given as padded (N, V, 2) arrays (repeated last vertices), summed
+# row by row. Each sum is the start point (sum of the lowest vertices) followed by all edges of both polygons
+# sorted by angle; padding only adds zero-length edges. Returns (N, V1 + V2, 2) padded polygons
+def minkowski_sum_batch(A, B):
+    def prepare(P):
+        area = np.einsum('nv,nv->n', P[..., 0], np.roll(P[..., 1], -1, axis=1)) - \
+               np.einsum('nv,nv->n', P[..., 1], np.roll(P[..., 0], -1, axis=1))
+        P = np.where((area < 0)[:, None, None], P[:, ::-1], P)
+        lowest = np.lexsort((P[..., 0], P[..., 1]), axis=-1)[:, 0]
+        return P, P[np.arange(len(P)), lowest], np.roll(P, -1, axis=1) - P
+    A, start_a, edges_a = prepare(np.asarray(A, dtype=float))
+    B, start_b, edges_b = prepare(np.asarray(B, dtype=float))
+    edges = np.concatenate([edges_a, edges_b], axis=1)
+    angles = np.mod(np.arctan2(edges[..., 1], edges[..., 0]), 2*np.pi)
+    angles[~np.any(edges, axis=-1)] = 0
+    edges = np.take_along_axis(edges, np.argsort(angles, axis=1, kind='stable')[..., None], axis=1)
+    start = (start_a + start_b)[:, None, :]
+    return np.concatenate([start, start + np.cumsum(edges[:, :-1], axis=1)], axis=1)
+
+# Batched point-in-convex-polygon test for points (N, 2) and CCW padded polygons (N, V, 2); the boundary counts
+# as inside, matching the touching-is-colliding convention of the SAT checks
+def points_in_polygons(points, polygons):
+    edges = np.roll(polygons, -1, axis=1) - polygons
+    rel = points[:, None, :] - polygons
+    return (edges[..., 0]*rel[..., 1] - edges[..., 1]*rel[..., 0] >= 0).all(axis=1)
+
+# Exact C-obstacles of the car rectangle for a set of orientation slices (degrees). A car pose is then in
+# collision exactly when its reference corner (x, y) lies inside one of the C-obstacles of its slice, so a pose
+# check is a point-in-polygon query instead of SAT against every obstacle. Poses between slices snap to the
+# nearest slice
+class CObstacleMap:
+    def __init__(self, obstacles, width, height, angles):
+        self.angles = np.asarray(angles, dtype=float)
+        self.width, self.height = width, height
+        obstacles = pad_polygons(obstacles)
+        bodies = get_coords_batch(0, 0, self.angles, width, height)
+        a, p = len(self.angles), len(obstacles)
+        self.polygons = minkowski_sum_batch(np.repeat(obstacles[None], a, axis=0).reshape(a*p, -1, 2),
+                                            np.repeat(-bodies, p, axis=0)).reshape(a, p, -1, 2)
+        self.boxes = np.stack([self.polygons.min(axis=2), self.polygons.max(axis=2)], axis=2)
+        self.indexes = [SweepAndPrune(boxes) for boxes in self.boxes] # One broad-phase index per orientation slice
+
+    # Index of the nearest orientation slice for each angle, treating angles as periodic in 360 degrees
+    def slice_index(self, angle):
+        diff = np.abs(np.mod(np.asarray(angle, dtype=float).ravel()[:, None] - self.angles + 180, 360) - 180)
+        return diff.argmin(axis=1)
+
+    # True where a pose (x, y, angle in degrees) hits an obstacle; does not check the workspace boundary
+    def collides(self, x, y, angle):
+        x, y, angle = np.broadcast_arrays(*(np.asarray(v, dtype=float).ravel() for v in (x, y, angle)))
+        points = np.stack([x, y], axis=1)
+        slices = self.slice_index(angle)
+        # Broad phase per slice: each point is a zero-size box queried against its slice's index
+        point, obstacle = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)]
+        for s in np.unique(slices):
+            members = np.flatnonzero(slices == s)
+            query, hit = self.indexes[s].query_batch(np.repeat(points[members, None, :], 2, axis=1))
+            point.append(members[query])
+            obstacle.append(hit)
+        point, obstacle = np.concatenate(point), np.concatenate(obstacle)
+        hits = points_in_polygons(points[point], self.polygons[slices[point], obstacle])
+        result = np.zeros(len(points), dtype=bool)
+        result[point[hits]] = True
+        return result
+
        
 if __name__ == '__main__':
+    import matplotlib.patches as patches
     obstacles = np.load('2d_rigid_body.npy', allow_pickle=True)
     ax = create_plot()
-    for polygon in obstacles:
-        add_polygon_to_scene(polygon,ax, 'blue')
-    car = []
-    while(True):
-        x,y = random.uniform(0, 1), random.uniform(0, 1)
-        car = patches.Rectangle((x,y),0.2,0.1,linewidth = 1, edgecolor = 'r', facecolor = 'blue')
-        if(check_car(car, obstacles)): break
-    ax.add_patch(car)
+    # Free starting pose in the lower-left quarter, unrotated
+    x, y, angle = sample_free_car_poses(1, 0.2, 0.1, obstacles, x_range=(0, 1), y_range=(0, 1), angle_range=(0, 0))[0]
+    car = patches.Rectangle((x,y),0.2,0.1,angle=angle,linewidth = 1, edgecolor = 'r', facecolor = 'blue')
     controller = CarController(ax, car, obstacles)
-    #collision_space(get_coords(car), obstacles, ax)
+    #collision_space(car, obstacles, ax)
     show_scene(ax)
 
 
@@ -0,0 +1,138 @@
+import hashlib
+import os
+import numpy as np
+
+# Packed storage for a scene of convex polygons.
+# All vertices live in one contiguous (M, 2) float buffer and polygon i is vertices[offsets[i]:offsets[i+1]].
+# Bounding boxes, edge normals (same convention as get_normals(get_edges(p))) and the projection extents
+# of every polygon onto its own normals are computed once when the store is built and saved alongside it,
+# so loading a scene never unpickles anything or redoes that geometry.
+
+ARRAYS = ('vertices', 'offsets', 'boxes', 'normals', 'extents')
+
+class PolygonStore:
+    def __init__(self, vertices, offsets, boxes=None, normals=None, extents=None):
+        self.vertices = vertices
+        self.offsets = offsets
+        self.boxes = compute_boxes(vertices, offsets) if boxes is None else boxes
+        self.normals = compute_normals(vertices, offsets) if normals is None else normals
+        self.extents = compute_extents(self) if extents is None else extents
+
+    @classmethod
+    def from_polygons(cls, polygons):
+        polygons = [np.asarray(p, dtype=float).reshape(-1, 2) for p in polygons]
+        counts = np.array([len(p) for p in polygons], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        vertices = np.concatenate(polygons) if polygons else np.empty((0, 2))
+        return cls(vertices, offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if not -len(self) <= i < len(self):
+            raise IndexError(f"polygon index {i} out of range for store of size {len(self)}")
+        i = i % len(self)
+        return self.vertices[self.offsets[i]:self.offsets[i+1]]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def counts(self):
+        return np.diff(self.offsets)
+
+    # Precomputed edge normals of polygon i
+    def polygon_normals(self, i):
+        return self.normals[self.offsets[i]:self.offsets[i+1]]
+
+    # Precomputed (min, max) projections of polygon i onto each of its own normals
+    def polygon_extents(self, i):
+        return self.extents[self.offsets[i]:self.offsets[i+1]]
+
+    # Packed-buffer index of every padded vertex of the selected polygons (all by default), repeating last vertices
+    def gather(self, indices=None):
+        indices = np.arange(len(self)) if indices is None else np.asarray(indices)
+        counts = self.counts[indices]
+        num_vertices = counts.max() if len(indices) else 0
+        return self.offsets[indices][:, None] + np.minimum(np.arange(num_vertices), counts[:, None] - 1)
+
+    # Gathers the selected polygons (all by default) into a padded (N, V, 2) array by repeating last vertices,
+    # the layout used by the batched SAT functions
+    def padded(self, indices=None):
+        return np.asarray(self.vertices)[self.gather(indices)]
+
+    # Precomputed (normals, extents) of the selected polygons in the same padded layout as padded(), for the
+    # geometry arguments of SAT_Collides_batch. Repeated entries only duplicate an axis, which SAT doesn't mind
+    def padded_geometry(self, indices=None):
+        gather = self.gather(indices)
+        return np.asarray(self.normals)[gather], np.asarray(self.extents)[gather]
+
+    # Returns a new store holding only the selected polygons
+    def subset(self, indices):
+        indices = np.asarray(indices, dtype=np.int64)
+        counts = self.counts[indices]
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        gather = np.repeat(self.offsets[indices] - offsets[:-1], counts) + np.arange(offsets[-1])
+        return PolygonStore(np.asarray(self.vertices)[gather], offsets, np.asarray(self.boxes)[indices],
+                            np.asarray(self.normals)[gather], np.asarray(self.extents)[gather])
+
+    # Saves as a single uncompressed .npz, or as a directory of .npy files that can be memory-mapped on load
+    def save(self, filename):
+        arrays = {name: np.asarray(getattr(self, name)) for name in ARRAYS}
+        if str(filename).endswith('.npz'):
+            np.savez(filename, **arrays)
+        else:
+            os.makedirs(filename, exist_ok=True)
+            for name, array in arrays.items():
+                np.save(os.path.join(filename, name + '.npy'), array, allow_pickle=False)
+
+    # Loads a store written by save(); pass mmap_mode='r' with a directory store to map it instead of reading it
+    @classmethod
+    def load(cls, filename, mmap_mode=None):
+        if str(filename).endswith('.npz'):
+            with np.load(filename, allow_pickle=False) as data:
+                return cls(*(data[name] for name in ARRAYS))
+        return cls(*(np.load(os.path.join(filename, name + '.npy'), mmap_mode=mmap_mode, allow_pickle=False)
+                     for name in ARRAYS))
+
+# Content digest of one polygon, so the same obstacle is recognised whatever list or store it comes from
+def obstacle_digest(obstacle):
+    return hashlib.sha256(np.ascontiguousarray(obstacle, dtype=float).tobytes()).hexdigest()
+
+# Digests of a whole obstacle set, sorted so the order of the obstacles does not matter
+def obstacle_digests(obstacles):
+    return sorted(obstacle_digest(o) for o in obstacles)
+
+# Index of the next vertex (wrapping around within each polygon) for every vertex in the packed buffer
+def next_vertex_index(offsets):
+    nxt = np.arange(1, offsets[-1] + 1)
+    nxt[offsets[1:] - 1] = offsets[:-1]
+    return nxt
+
+def compute_boxes(vertices, offsets):
+    if len(offsets) < 2:
+        return np.empty((0, 2, 2))
+    starts = offsets[:-1]
+    return np.stack([np.minimum.reduceat(vertices, starts, axis=0),
+                     np.maximum.reduceat(vertices, starts, axis=0)], axis=1)
+
+def compute_normals(vertices, offsets):
+    edges = vertices - vertices[next_vertex_index(offsets)]
+    return np.stack([-edges[:, 1], edges[:, 0]], axis=1)
+
+# Projection extents of each polygon onto its own normals, done on padded chunks to bound memory
+def compute_extents(store, chunk_size=4096):
+    extents = np.empty((store.offsets[-1], 2))
+    counts = store.counts
+    for start in range(0, len(store), chunk_size):
+        indices = np.arange(start, min(start + chunk_size, len(store)))
+        padded = store.padded(indices)
+        num_vertices = padded.shape[1]
+        gather = store.offsets[indices][:, None] + np.minimum(np.arange(num_vertices), counts[indices][:, None] - 1)
+        projections = np.matmul(store.normals[gather], padded.transpose(0, 2, 1))
+        valid = np.arange(num_vertices) < counts[indices][:, None]
+        extents[gather[valid], 0] = projections.min(axis=2)[valid]
+        extents[gather[valid], 1] = projections.max(axis=2)[valid]
+    return extents
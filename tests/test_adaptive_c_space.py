@@ -0,0 +1,32 @@
+import os
+import numpy as np
+import pytest
+from adaptive_c_space import arm_adaptive_c_space, car_adaptive_c_space
+from c_space import arm_c_space, car_c_space_grid, car_grid_axes
+from create_scene import load_polygons
+from planar_arm import Arm_Controller
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Brute-force nearest grid sample along every axis
+def nearest(axes, points):
+    return tuple(np.abs(a[None, :] - v[:, None]).argmin(axis=1) for a, v in zip(axes, points.T))
+
+def check_against_dense(adaptive, dense, axes, seed):
+    np.testing.assert_array_equal(adaptive.to_dense(), dense)
+    assert 0 < dense.mean() < 1
+    assert adaptive.stats()['finest_leaves'] < dense.size # The tree only refines along boundaries
+    rng = np.random.default_rng(seed)
+    points = np.stack([rng.uniform(a[0], a[-1], 5000) for a in axes], axis=1)
+    np.testing.assert_array_equal(adaptive.collides(points), dense[nearest(axes, points)] == 1)
+
+@pytest.mark.parametrize('resolution', [60, 300])
+def test_arm_matches_dense_grid(resolution):
+    arm = Arm_Controller(0, 0, None, load_polygons(os.path.join(ROOT, 'arm_polygons.npy')))
+    adaptive = arm_adaptive_c_space(arm, resolution)
+    check_against_dense(adaptive, arm_c_space(arm, resolution), adaptive.axes, resolution)
+
+def test_car_matches_dense_grid():
+    obstacles = load_polygons(os.path.join(ROOT, '2d_rigid_body.npy'))
+    adaptive = car_adaptive_c_space(0.2, 0.1, obstacles, 24)
+    check_against_dense(adaptive, car_c_space_grid(*car_grid_axes(24), 0.2, 0.1, obstacles), adaptive.axes, 24)
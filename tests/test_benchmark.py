@@ -0,0 +1,16 @@
+import numpy as np
+from benchmark import arm_scene, make_scene
+from c_space import arm_geometry
+from planar_arm import Arm_Controller
+
+# Scenes stay uniform; the arm's version only clears what its base joint, link 1 and joint 2 can reach
+def test_arm_scene_clears_only_the_first_link():
+    scene = make_scene(5000, 4)
+    assert len(scene) == 5000
+    cleared = arm_scene(scene)
+    arm = Arm_Controller(0, 0, None, cleared)
+    assert 0.7 * len(scene) < len(cleared) < len(scene)
+    joints, rects = arm_geometry(arm, np.linspace(-np.pi, np.pi, 360), np.zeros(1))
+    assert not arm.obs_set.circles_collide(joints[:, :2].reshape(-1, 2), arm.rad).any()
+    assert not arm.obs_set.polygons_collide(rects[:, 0]).any()
+    assert arm.obs_set.polygons_collide(arm_geometry(arm, np.linspace(-np.pi, np.pi, 360), np.linspace(-np.pi, np.pi, 360))[1][:, 1]).any()
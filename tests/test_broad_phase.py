@@ -0,0 +1,37 @@
+import numpy as np
+from broad_phase import SweepAndPrune
+
+def random_boxes(rng, n):
+    low = rng.uniform(0, 2, (n, 2))
+    return np.stack([low, low + rng.uniform(0.01, 0.2, (n, 2))], axis=1)
+
+def pairs(i, j):
+    return sorted(zip(i.tolist(), j.tolist()))
+
+# An index patched with update() answers exactly like one rebuilt from the same boxes
+def test_update_matches_rebuild():
+    rng = np.random.default_rng(0)
+    boxes = random_boxes(rng, 500)
+    index = SweepAndPrune(boxes)
+    queries = random_boxes(rng, 200)
+    for _ in range(20):
+        moved = rng.choice(len(boxes), rng.integers(1, 60), replace=False)
+        boxes[moved] = random_boxes(rng, len(moved))
+        index.update(moved, boxes[moved])
+        rebuilt = SweepAndPrune(boxes)
+        assert (np.diff(index.min_x) >= 0).all()
+        assert pairs(*index.query_batch(queries)) == pairs(*rebuilt.query_batch(queries))
+        assert pairs(*index.self_pairs()) == pairs(*rebuilt.self_pairs())
+
+# Expanding the candidates in small groups finds the same pairs as expanding them all at once
+def test_grouped_query_matches_single_pass():
+    rng = np.random.default_rng(1)
+    index = SweepAndPrune(random_boxes(rng, 2000))
+    queries = random_boxes(rng, 300)
+    whole = index.query_batch(queries)
+    for max_candidates in (1, 50, 4096):
+        grouped = index.query_batch(queries, max_candidates)
+        assert pairs(*grouped) == pairs(*whole)
+        assert (np.diff(grouped[0]) >= 0).all() # Still grouped by query, in query order
+    empty = index.query_batch(np.zeros((0, 2, 2)), 1)
+    assert empty[0].shape == empty[1].shape == (0,)
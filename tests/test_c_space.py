@@ -0,0 +1,63 @@
+import numpy as np
+from c_space import ObstacleSet, arm_c_space, arm_grid_axes
+from collision_checking import circle_poly_collides, collides
+from planar_arm import Arm_Controller
+from scene_store import PolygonStore
+
+def random_convex(rng, n, center, radius):
+    angles = np.sort(rng.uniform(0, 2 * np.pi, n))
+    return np.asarray(center) + radius * np.stack([np.cos(angles), np.sin(angles)], axis=1)
+
+RNG = np.random.default_rng(0)
+OBSTACLES = [random_convex(RNG, RNG.integers(3, 9), RNG.uniform(0, 2, 2), RNG.uniform(0.03, 0.15)) for _ in range(100)]
+
+# Chunked queries answer like the scalar checks, whatever the chunk size
+def test_obstacle_set_matches_scalar_checks():
+    rng = np.random.default_rng(1)
+    centers, radius = rng.uniform(0, 2, (300, 2)), rng.uniform(0.01, 0.1, 300)
+    polygons = np.array([random_convex(rng, 5, c, r) for c, r in zip(rng.uniform(0, 2, (300, 2)), rng.uniform(0.02, 0.2, 300))])
+    circles = np.array([any(circle_poly_collides(c, r, o) for o in OBSTACLES) for c, r in zip(centers, radius)])
+    hits = np.array([not all(collides(p, o) for o in OBSTACLES) for p in polygons])
+    assert circles.any() and hits.any() and not hits.all()
+    for obstacles in (ObstacleSet(OBSTACLES), ObstacleSet(PolygonStore.from_polygons(OBSTACLES))):
+        for chunk_size in (1, 7, 1024):
+            np.testing.assert_array_equal(obstacles.circles_collide(centers, radius, chunk_size), circles)
+            np.testing.assert_array_equal(obstacles.polygons_collide(polygons, chunk_size), hits)
+
+# The vectorized grid matches setting each configuration on the arm and running compute_arm_collisions
+def test_arm_c_space_matches_per_configuration_loop():
+    obstacles = [o for o in OBSTACLES if np.hypot(*(o - 1).T).min() > 0.2]
+    arm = Arm_Controller(0, 0, None, obstacles)
+    grid = arm_c_space(arm, 40)
+    expected = np.zeros_like(grid)
+    for i, theta1 in enumerate(arm_grid_axes(40)[0]):
+        for j, theta2 in enumerate(arm_grid_axes(40)[1]):
+            arm.theta1, arm.theta2 = theta1, theta2
+            arm.re_orient()
+            expected[i, j] = any(arm.compute_arm_collisions())
+    assert 0 < expected.sum() < expected.size
+    np.testing.assert_array_equal(grid, expected)
+
+# Exact distance from a point to a convex polygon, 0 inside it
+def polygon_distance(center, polygon):
+    a, b = polygon, np.roll(polygon, -1, axis=0)
+    cross = (b - a)[:, 0] * (center - a)[:, 1] - (b - a)[:, 1] * (center - a)[:, 0]
+    if (cross >= 0).all() or (cross <= 0).all():
+        return 0.0
+    t = np.clip(np.einsum('ij,ij->i', center - a, b - a) / np.einsum('ij,ij->i', b - a, b - a), 0, 1)
+    return np.hypot(*(center - (a + t[:, None] * (b - a))).T).min()
+
+# Edge normals far from unit length (tiny and huge polygons, long thin slivers) and circles just clear of or
+# just touching the polygon, where comparing the +-radius projection on unnormalized axes gets it wrong
+def test_circle_poly_collides_near_tangent():
+    rng = np.random.default_rng(2)
+    for _ in range(500):
+        scale = 10.0 ** rng.uniform(-2, 2)
+        polygon = random_convex(rng, rng.integers(3, 9), (0, 0), scale) * [1, rng.choice([1, 0.02])]
+        center = rng.normal(size=2) * 2 * scale
+        distance = polygon_distance(center, polygon)
+        if distance == 0:
+            assert circle_poly_collides(center, scale * 0.01, polygon)
+            continue
+        assert circle_poly_collides(center, distance * 1.001, polygon)
+        assert not circle_poly_collides(center, distance * 0.999, polygon)
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+import c_space_cache
+from c_space_cache import CSpaceCache, job_grid
+from planar_arm import Arm_Controller
+from tiled_c_space import arm_job, car_job
+
+def random_convex(rng, n, center, radius):
+    angles = np.sort(rng.uniform(0, 2 * np.pi, n))
+    return np.asarray(center) + radius * np.stack([np.cos(angles), np.sin(angles)], axis=1)
+
+# Obstacles kept away from the arm's base joint, so its c-space isn't blocked outright
+def random_obstacles(rng, count):
+    obstacles = []
+    while len(obstacles) < count:
+        center = rng.uniform(0, 2, 2)
+        if np.hypot(*(center - 1)) > 0.3:
+            obstacles.append(random_convex(rng, rng.integers(3, 9), center, rng.uniform(0.03, 0.1)))
+    return obstacles
+
+UPDATE_GRID = c_space_cache.update_grid
+JOBS = {'arm': arm_job(Arm_Controller(0, 0, None), 60), 'car': car_job(0.2, 0.1, 20)}
+
+@pytest.mark.parametrize('kind', sorted(JOBS))
+def test_incremental_update_matches_full_recompute(kind, tmp_path, monkeypatch):
+    job, rng = JOBS[kind], np.random.default_rng(0)
+    cache = CSpaceCache(str(tmp_path))
+    updates = []
+    monkeypatch.setattr(c_space_cache, 'update_grid', lambda *args, **kwargs: updates.append(args) or UPDATE_GRID(*args, **kwargs))
+    obstacles = random_obstacles(rng, 30)
+    np.testing.assert_array_equal(cache.get(job, obstacles).to_dense(), job_grid(job, obstacles))
+    assert not updates
+    for change in range(3):
+        removed = set(rng.choice(len(obstacles), 3, replace=False).tolist())
+        kept, added = [o for k, o in enumerate(obstacles) if k not in removed], random_obstacles(rng, 3)
+        expected = job_grid(job, kept + added)
+        assert 0 < expected.mean() < 1
+        # Re-checking only the cells the removed obstacles blocked, however many there are
+        old, removed = job_grid(job, obstacles), [obstacles[k] for k in sorted(removed)]
+        np.testing.assert_array_equal(UPDATE_GRID(job, old, kept + added, added, removed, max_stale=1.0), expected)
+        obstacles = kept + added
+        np.testing.assert_array_equal(cache.get(job, obstacles).to_dense(), expected)
+        assert len(updates) == change + 1 # Updated from the previous entry, not recomputed
+
+# The key only depends on which obstacles there are, so a reordered (or copied) list is a hit
+@pytest.mark.parametrize('kind', sorted(JOBS))
+def test_reordered_obstacles_hit(kind, tmp_path, monkeypatch):
+    job, rng = JOBS[kind], np.random.default_rng(1)
+    cache = CSpaceCache(str(tmp_path))
+    obstacles = random_obstacles(rng, 20)
+    grid = cache.get(job, obstacles).to_dense()
+    fail = lambda *args, **kwargs: pytest.fail("cache miss")
+    monkeypatch.setattr(c_space_cache, 'job_grid', fail)
+    monkeypatch.setattr(c_space_cache, 'update_grid', fail)
+    reordered = [obstacles[k].copy() for k in rng.permutation(len(obstacles))]
+    np.testing.assert_array_equal(cache.get(job, reordered).to_dense(), grid)
@@ -0,0 +1,60 @@
+import numpy as np
+from collision_cache import CollisionCache
+from planar_arm import Arm_Controller
+from rigid_body import check_car
+
+def block(x):
+    return np.array([[x, 0.9], [x + 0.1, 0.9], [x + 0.1, 1.1], [x, 1.1]])
+
+def test_rebinding_same_contents_keeps_entries():
+    obstacles = [block(0.2)]
+    cache = CollisionCache()
+    cache.bind(obstacles)
+    cache.get((0.0,), lambda: 'answer')
+    cache.bind(obstacles)
+    cache.bind([o.copy() for o in obstacles])
+    assert cache.get((0.0,), lambda: 'recomputed') == 'answer'
+
+def test_in_place_changes_invalidate_on_bind():
+    obstacles = [block(0.2)]
+    cache = CollisionCache()
+    cache.bind(obstacles)
+    for change in (lambda: obstacles.append(block(0.5)), lambda: obstacles.pop(), lambda: obstacles[0].__iadd__(0.1)):
+        cache.get((0.0,), lambda: 'stale')
+        change()
+        cache.bind(obstacles)
+        assert cache.get((0.0,), lambda: 'fresh') == 'fresh'
+
+# The arm's cached answer must follow obstacles appended to the same list it was given
+def test_arm_cache_sees_appended_obstacle():
+    obstacles = [block(0.2)]
+    arm = Arm_Controller(0, 0, None, obstacles)
+    arm.enable_collision_cache()
+    assert not any(arm.check_arm_collisions())
+    obstacles.append(block(1.2))
+    arm.set_arm_obs(obstacles)
+    assert any(arm.check_arm_collisions())
+
+# Obstacle list that counts how often it is read
+class CountingList(list):
+    reads = 0
+    def __iter__(self):
+        self.reads += 1
+        return super().__iter__()
+    def __getitem__(self, i):
+        self.reads += 1
+        return super().__getitem__(i)
+    def __len__(self):
+        self.reads += 1
+        return super().__len__()
+
+# A cached check_car answer costs a lookup, not a pass over the scene
+def test_check_car_hit_does_not_read_obstacles():
+    obstacles = CountingList([block(0.2 + 0.05 * k) for k in range(20)])
+    cache = CollisionCache()
+    cache.bind(obstacles)
+    pose = (0.25, 1.0, 0.0, 0.2, 0.1)
+    assert not check_car(pose, obstacles, cache=cache)
+    obstacles.reads = 0
+    assert not check_car(pose, obstacles, cache=cache)
+    assert obstacles.reads == 0 and cache.hits == 1
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+from collision_checking import SAT_Collides, SAT_Collides_batch
+from scene_store import PolygonStore
+
+# Convex polygon with n vertices at sorted random angles on a circle, counterclockwise like make_polygons' hulls
+def random_convex(rng, n, center, radius):
+    angles = np.sort(rng.uniform(0, 2 * np.pi, n))
+    return np.asarray(center) + radius * np.stack([np.cos(angles), np.sin(angles)], axis=1)
+
+def square(x, y, size):
+    return np.array([[x, y], [x + size, y], [x + size, y + size], [x, y + size]], dtype=float)
+
+def random_pairs(seed=0, count=2000):
+    rng = np.random.default_rng(seed)
+    pairs = []
+    for _ in range(count):
+        n1, n2 = rng.integers(3, 13, size=2)
+        p1 = random_convex(rng, n1, rng.uniform(0, 1, 2), rng.uniform(0.05, 0.3))
+        p2 = random_convex(rng, n2, rng.uniform(0, 1, 2), rng.uniform(0.05, 0.3))
+        pairs.append((p1, p2))
+    return pairs
+
+def special_pairs():
+    big = square(0, 0, 4)
+    return [
+        (square(0, 0, 1), square(1, 0, 1)),             # Shared edge
+        (square(0, 0, 1), square(1, 1, 1)),             # Shared corner
+        (square(0, 0, 1), square(1, 2, 1)),             # Apart along y only
+        (big, square(1, 1, 1)),                         # Containment
+        (square(1, 1, 1), big),
+        (big, np.array([[2, 2], [3, 2], [2.5, 3]])),    # Triangle inside a square
+        (np.array([[0, 0], [2, 0], [1, 2]]), np.array([[0, 2], [2, 2], [1, 0]])), # Crossing triangles
+        (np.array([[0, 0], [2, 0], [1, 1]]), np.array([[0, 1.5], [2, 1.5], [1, 1]])), # Tip to tip
+    ]
+
+@pytest.mark.parametrize('pairs', [random_pairs(), special_pairs()], ids=['random', 'special'])
+def test_batch_matches_scalar(pairs):
+    expected = np.array([SAT_Collides(p1, p2) for p1, p2 in pairs])
+    got = SAT_Collides_batch([p1 for p1, _ in pairs], [p2 for _, p2 in pairs], chunk_size=97)
+    np.testing.assert_array_equal(got, expected)
+
+def test_special_cases():
+    assert SAT_Collides_batch(*zip(*special_pairs())).tolist() == [True, True, False, True, True, True, True, True]
+
+def test_batch_with_store_geometry_matches_scalar():
+    pairs = random_pairs(seed=1, count=500) + special_pairs()
+    first = PolygonStore.from_polygons([p1 for p1, _ in pairs])
+    second = PolygonStore.from_polygons([p2 for _, p2 in pairs])
+    expected = np.array([SAT_Collides(p1, p2) for p1, p2 in pairs])
+    got = SAT_Collides_batch(first.padded(), second.padded(), 64, first.padded_geometry(), second.padded_geometry())
+    np.testing.assert_array_equal(got, expected)
+
+def test_empty_batch():
+    assert SAT_Collides_batch([], []).shape == (0,)
@@ -0,0 +1,89 @@
+import asyncio
+import threading
+import numpy as np
+import pytest
+from c_space import ObstacleSet, arm_collisions, car_collisions
+from collision_checking import pad_polygons
+from collision_client import CollisionClient
+from collision_server import CollisionServer
+from planar_arm import Arm_Controller
+
+def random_convex(rng, n, center, radius):
+    angles = np.sort(rng.uniform(0, 2 * np.pi, n))
+    return np.asarray(center) + radius * np.stack([np.cos(angles), np.sin(angles)], axis=1)
+
+RNG = np.random.default_rng(0)
+OBSTACLES = [random_convex(RNG, RNG.integers(3, 9), RNG.uniform(0, 2, 2), RNG.uniform(0.03, 0.12)) for _ in range(60)]
+
+# Runs a server for OBSTACLES on a Unix socket in a background event loop, yields the socket path
+@pytest.fixture
+def server_path(tmp_path):
+    path = str(tmp_path / 'collisions.sock')
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+    task = loop.create_task(CollisionServer(OBSTACLES).serve(path, ready=lambda server: ready.set()))
+    thread = threading.Thread(target=lambda: loop.run_until_complete(asyncio.wait([task])))
+    thread.start()
+    assert ready.wait(10)
+    yield path
+    loop.call_soon_threadsafe(task.cancel)
+    thread.join()
+    loop.close()
+
+def queries(seed):
+    rng = np.random.default_rng(seed)
+    polygons = [random_convex(rng, rng.integers(3, 9), rng.uniform(0, 2, 2), rng.uniform(0.02, 0.2)) for _ in range(50)]
+    poses = np.column_stack([rng.uniform(0, 2, (200, 2)), rng.uniform(0, 360, 200)])
+    thetas = rng.uniform(-np.pi, np.pi, (200, 2))
+    return polygons, poses, thetas
+
+# What the client should get back, computed in process
+def expected(polygons, poses, thetas):
+    obstacles = ObstacleSet(OBSTACLES)
+    return (obstacles.polygons_collide(pad_polygons(polygons)),
+            car_collisions(*poses.T, 0.2, 0.1, obstacles),
+            arm_collisions(Arm_Controller(0, 0, None, OBSTACLES), *thetas.T))
+
+def answers(client, polygons, poses, thetas):
+    return (client.polygons_collide(polygons),
+            client.car_collisions(poses, 0.2, 0.1, bounds=(0, 2, 0, 2)),
+            client.arm_collisions(*thetas.T))
+
+def test_client_matches_in_process_checks(server_path):
+    with CollisionClient(server_path) as client:
+        for got, want in zip(answers(client, *queries(1)), expected(*queries(1))):
+            np.testing.assert_array_equal(got, want)
+        assert client.stats()['obstacles'] == len(OBSTACLES)
+
+def test_concurrent_clients(server_path):
+    results, errors = {}, []
+    def run(seed):
+        try:
+            with CollisionClient(server_path) as client:
+                results[seed] = answers(client, *queries(seed))
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=run, args=(seed,)) for seed in range(6)]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+    assert not errors
+    for seed in range(6):
+        for got, want in zip(results[seed], expected(*queries(seed))):
+            np.testing.assert_array_equal(got, want)
+
+# Requests may only override the arm's geometry fields, and a rejected request leaves the shared arm untouched
+def test_arm_overrides_are_validated(server_path):
+    thetas = np.zeros((1, 2))
+    with CollisionClient(server_path, arm={'compute_rect_anchor': 1}) as client:
+        with pytest.raises(RuntimeError, match='unknown arm fields'):
+            client.arm_collisions(*thetas.T)
+    for arm in ({'rad': 'wide'}, {'rad': -0.1}, {'joint1': [1]}, {'rlen1': None}):
+        with CollisionClient(server_path, arm=arm) as client:
+            with pytest.raises(RuntimeError):
+                client.arm_collisions(*thetas.T)
+    with CollisionClient(server_path) as client:
+        np.testing.assert_array_equal(client.arm_collisions(*thetas.T), arm_collisions(Arm_Controller(0, 0, None, OBSTACLES), *thetas.T))
+    with CollisionClient(server_path, arm={'rlen1': '0.3', 'joint1': [0.5, 0.5]}) as client:
+        arm = Arm_Controller(0, 0, None, OBSTACLES)
+        arm.rlen1, arm.joint1 = 0.3, (0.5, 0.5)
+        np.testing.assert_array_equal(client.arm_collisions(*thetas.T), arm_collisions(arm, *thetas.T))
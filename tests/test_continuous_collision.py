@@ -0,0 +1,64 @@
+import numpy as np
+from c_space import ObstacleSet, car_collisions
+from continuous_collision import arm_first_contact, car_first_contact, sweep_tolerance
+from tiled_c_space import job_arm
+
+BLOCK = [np.array([[1.0, 0.9], [1.3, 0.9], [1.3, 1.3], [1.0, 1.3]])]
+ARM = {'joint1': [1, 1], 'rad': 0.05, 'rwid': 0.1, 'rlen1': 0.4, 'rlen2': 0.25}
+
+# A car that is free but closer to the block than the sample margin must still be able to back away
+def test_car_can_move_away_from_nearby_obstacle():
+    obstacles = ObstacleSet(BLOCK)
+    start = np.array([0.798, 1.0, 0.0])
+    assert not car_collisions(*start[:, None], 0.2, 0.1, obstacles).any()
+    assert np.isinf(car_first_contact(start, [0.748, 1.0, 0.0], 0.2, 0.1, obstacles)[0])
+    # Turning or sliding along the block needs samples finer than the 0.002 gap
+    for end in ([0.798, 1.0, 10.0], [0.798, 1.05, 0.0]):
+        assert np.isinf(car_first_contact(start, end, 0.2, 0.1, obstacles, sweep_tolerance(0.002))[0])
+    assert np.isfinite(car_first_contact(start, [0.848, 1.0, 0.0], 0.2, 0.1, obstacles)[0])
+
+def test_car_contact_time_is_early_and_close():
+    obstacles = ObstacleSet(BLOCK)
+    contact = car_first_contact([0.5, 1.0, 0.0], [0.9, 1.0, 0.0], 0.2, 0.1, obstacles, tolerance=0.001)[0]
+    assert 0.75 - 0.01 <= contact <= 0.75 # The car's front reaches x = 1.0 at t = 0.75
+
+def test_arm_can_move_away_from_nearby_obstacle():
+    arm = job_arm({'geometry': ARM})
+    # At theta1 = theta2 = 0 the last joint reaches x = 1.9; put a block just past it
+    obstacles = ObstacleSet([np.array([[1.902, 0.8], [1.95, 0.8], [1.95, 1.2], [1.902, 1.2]])])
+    assert np.isinf(arm_first_contact(arm, [0.0, 0.0], [0.0, 0.0], obstacles)[0])
+    assert np.isinf(arm_first_contact(arm, [0.0, 0.0], [0.0, np.radians(90)], obstacles, sweep_tolerance(0.002))[0])
+
+class Key:
+    def __init__(self, key):
+        self.key = key
+
+# The controllers sample the sweep finer than the start clearance, so they can also turn next to the block
+def test_car_controller_moves_away_from_nearby_obstacle():
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from matplotlib.patches import Rectangle
+    from rigid_body import CarController
+    fig, ax = plt.subplots()
+    for key, moved in (('down', True), ('left', True), ('up', False)):
+        car = Rectangle((0.798, 1.0), 0.2, 0.1)
+        ax.add_patch(car)
+        controller = CarController(ax, car, BLOCK)
+        controller.on_key_press(Key(key))
+        assert (car.get_x(), car.get_angle()) != (0.798, 0.0) if moved else (car.get_x(), car.get_angle()) == (0.798, 0.0)
+    plt.close(fig)
+
+# A blocked arm step measures the start clearance once and sweeps against the arm's own obstacle set
+def test_arm_key_press_reuses_clearance_and_obstacle_set(monkeypatch):
+    import c_space
+    from planar_arm import Arm_Controller
+    arm = Arm_Controller(0, 0, None, [np.array([[1.902, 0.8], [1.95, 0.8], [1.95, 1.2], [1.902, 1.2]])])
+    arm.draw_arm = lambda collisions: None
+    built, measured = [], []
+    monkeypatch.setattr(c_space.ObstacleSet, '__init__', lambda self, *args: built.append(args))
+    step_clearance = arm.step_clearance
+    arm.step_clearance = lambda *args, **kwargs: measured.append(args) or step_clearance(*args, **kwargs)
+    arm.on_key(Key('up'))
+    assert (built, len(measured)) == ([], 1)
+    assert arm.theta2 > 0 # Moving away from the block is allowed
@@ -0,0 +1,19 @@
+import numpy as np
+from create_scene import generate_polygons, load_polygons, stream_polygons
+from scene_store import PolygonStore
+
+def test_stream_polygons_without_seed(tmp_path):
+    stream_polygons(str(tmp_path / 'scene'), 500, 3, 12, 0.01, 0.05, seed=None, chunk_size=128)
+    store = load_polygons(str(tmp_path / 'scene'))
+    assert len(store) == 500
+    assert store.offsets[-1] == len(store.vertices)
+    assert ((store.counts >= 3) & (store.counts <= 12)).all()
+
+def test_stream_polygons_matches_generate_polygons(tmp_path):
+    stream_polygons(str(tmp_path / 'scene'), 300, 3, 8, 0.01, 0.05, seed=7, chunk_size=100)
+    store = load_polygons(str(tmp_path / 'scene'))
+    chunks = list(generate_polygons(300, 3, 8, 0.01, 0.05, seed=7, chunk_size=100))
+    expected = PolygonStore.from_polygons([p for chunk in chunks for p in chunk])
+    np.testing.assert_array_equal(store.vertices, expected.vertices)
+    np.testing.assert_array_equal(store.offsets, expected.offsets)
+    np.testing.assert_allclose(store.boxes, expected.boxes)
@@ -0,0 +1,54 @@
+import numpy as np
+from c_space import ObstacleSet
+from distance_field import SignedDistanceField
+from gjk import ConvexShape, gjk_distance
+
+def random_convex(rng, n, center, radius):
+    angles = np.sort(rng.uniform(0, 2 * np.pi, n))
+    return np.asarray(center) + radius * np.stack([np.cos(angles), np.sin(angles)], axis=1)
+
+# Obstacles on both sides of the field's 0..2 bounds, and queries reaching past them
+RNG = np.random.default_rng(0)
+OBSTACLES = [random_convex(RNG, RNG.integers(3, 9), RNG.uniform(-0.4, 2.4, 2), RNG.uniform(0.05, 0.2)) for _ in range(80)]
+FIELD = SignedDistanceField.build(OBSTACLES, resolution=64)
+
+def test_discs_match_exact_test():
+    rng = np.random.default_rng(1)
+    centers, radius = rng.uniform(-0.3, 2.3, (4000, 2)), rng.uniform(0.01, 0.1, 4000)
+    exact = ObstacleSet(OBSTACLES).circles_collide(centers, radius)
+    assert exact.any() and not exact.all()
+    np.testing.assert_array_equal(FIELD.discs_collide(centers, radius), exact)
+    assert not (FIELD.discs_free(centers, radius) & exact).any()
+    # Without obstacles to fall back on, undecided discs count as collisions, so none is missed
+    blind = SignedDistanceField(FIELD.values, FIELD.bounds)
+    assert not (exact & ~blind.discs_collide(centers, radius)).any()
+
+def test_capsules_match_exact_test():
+    rng = np.random.default_rng(2)
+    p0 = rng.uniform(-0.3, 2.3, (600, 2))
+    p1 = p0 + rng.uniform(-0.4, 0.4, (600, 2))
+    radius = rng.uniform(0.01, 0.06, 600)
+    shapes = [ConvexShape(o) for o in OBSTACLES]
+    exact = np.array([any(gjk_distance(ConvexShape([a, b], r), s).distance <= 0 for s in shapes) for a, b, r in zip(p0, p1, radius)])
+    assert exact.any() and not exact.all()
+    np.testing.assert_array_equal(FIELD.capsules_collide(p0, p1, radius), exact)
+    assert not (FIELD.capsules_free(p0, p1, radius) & exact).any()
+    blind = SignedDistanceField(FIELD.values, FIELD.bounds)
+    assert not (exact & ~blind.capsules_collide(p0, p1, radius)).any()
+
+# The arm's narrow-phase shortcut stays exact even when the field covers only part of the arm's workspace
+def test_arm_with_partial_field_matches_exact():
+    from planar_arm import Arm_Controller
+    arm = Arm_Controller(0, 0, None, OBSTACLES)
+    exact = []
+    thetas = np.random.default_rng(3).uniform(-np.pi, np.pi, (300, 2))
+    for theta1, theta2 in thetas:
+        arm.theta1, arm.theta2 = theta1, theta2
+        arm.re_orient()
+        exact.append(arm.compute_arm_collisions())
+    arm.set_distance_field(SignedDistanceField.build(OBSTACLES, resolution=64, bounds=(0, 1.2, 0, 1.2)))
+    for (theta1, theta2), expected in zip(thetas, exact):
+        arm.theta1, arm.theta2 = theta1, theta2
+        arm.re_orient()
+        assert arm.compute_arm_collisions() == expected
+    assert any(any(e) for e in exact)
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+from collision_checking import SAT_Collides, frame_gaps, pad_polygons
+from gjk import ConvexShape, GJKCache, gjk_distance
+
+def random_convex(rng, n, center, radius):
+    angles = np.sort(rng.uniform(0, 2 * np.pi, n))
+    return np.asarray(center) + radius * np.stack([np.cos(angles), np.sin(angles)], axis=1)
+
+def random_pairs(seed=0, count=500):
+    rng = np.random.default_rng(seed)
+    return [(random_convex(rng, rng.integers(3, 13), rng.uniform(0, 1, 2), rng.uniform(0.05, 0.3)),
+             random_convex(rng, rng.integers(3, 13), rng.uniform(0, 1, 2), rng.uniform(0.05, 0.3))) for _ in range(count)]
+
+def edges(polygon):
+    return polygon, np.roll(polygon, -1, axis=0)
+
+# Brute-force distance between two polygons that don't overlap: the closest vertex/edge pair either way
+def edge_distance(polygon1, polygon2):
+    best = np.inf
+    for points, polygon in ((polygon1, polygon2), (polygon2, polygon1)):
+        a, b = edges(polygon)
+        for p in points:
+            t = np.clip(np.einsum('ij,ij->i', p - a, b - a) / np.einsum('ij,ij->i', b - a, b - a), 0, 1)
+            best = min(best, np.hypot(*(p - (a + t[:, None] * (b - a))).T).min())
+    return best
+
+# Penetration depth of two overlapping convex shapes: the smallest overlap of their projections over the edge
+# normals of both, which are the edge normals of their Minkowski difference
+def min_overlap(shape1, shape2):
+    a, b = np.concatenate([edges(shape1)[0], edges(shape2)[0]]), np.concatenate([edges(shape1)[1], edges(shape2)[1]])
+    normals = np.stack([(b - a)[:, 1], -(b - a)[:, 0]], axis=1)
+    normals = normals[np.hypot(*normals.T) > 0]
+    normals /= np.hypot(*normals.T)[:, None]
+    p1, p2 = shape1 @ normals.T, shape2 @ normals.T
+    return np.minimum(p1.max(axis=0) - p2.min(axis=0), p2.max(axis=0) - p1.min(axis=0)).min()
+
+@pytest.mark.parametrize('seed', [0, 1])
+def test_gjk_matches_sat_and_brute_force(seed):
+    for p1, p2 in random_pairs(seed):
+        result = gjk_distance(ConvexShape(p1), ConvexShape(p2))
+        assert result.collides == SAT_Collides(p1, p2)
+        if result.collides:
+            assert -result.distance == pytest.approx(min_overlap(p1, p2), abs=1e-9)
+        else:
+            assert result.distance == pytest.approx(edge_distance(p1, p2), abs=1e-9)
+
+def test_warm_start_gives_same_distance():
+    cache = GJKCache()
+    for p1, p2 in random_pairs(2, 100):
+        a, b = ConvexShape(p1), ConvexShape(p2)
+        first = cache.distance('pair', a, b).distance
+        assert cache.distance('pair', a, b).distance == pytest.approx(first, abs=1e-9)
+        cache.clear()
+
+# A capsule (segment core) crossing a polygon, the case whose interior simplex points broke the EPA polytope
+def test_capsule_core_crossing_polygon_depth():
+    rng = np.random.default_rng(3)
+    for _ in range(300):
+        center, size, radius = rng.uniform(0, 1, 2), rng.uniform(0.1, 0.3), rng.uniform(0, 0.05)
+        polygon = random_convex(rng, rng.integers(3, 13), center, size)
+        direction = rng.normal(size=2)
+        direction /= np.hypot(*direction)
+        middle = center + rng.uniform(-0.5, 0.5) * size * rng.normal(size=2)
+        core = np.array([middle - 1.5 * size * direction, middle + rng.uniform(-0.5, 1.5) * size * direction])
+        result = gjk_distance(ConvexShape(core, radius), ConvexShape(polygon))
+        if SAT_Collides(core, polygon):
+            assert -result.distance == pytest.approx(min_overlap(core, polygon) + radius, abs=1e-9)
+        else:
+            assert result.distance == pytest.approx(edge_distance(core, polygon) - radius, abs=1e-9)
+
+# frame_gaps never overestimates a distance, so pruning clearance() with it still finds the exact minimum
+def test_pruned_clearance_is_exact():
+    rng = np.random.default_rng(4)
+    obstacles = [random_convex(rng, rng.integers(3, 9), rng.uniform(0, 2, 2), rng.uniform(0.02, 0.1)) for _ in range(200)]
+    shapes = [ConvexShape(o) for o in obstacles]
+    for _ in range(20):
+        parts = [random_convex(rng, 4, rng.uniform(0.5, 1.5, 2), rng.uniform(0.1, 0.3)) for _ in range(3)]
+        part, obstacle = np.divmod(np.arange(len(parts) * len(obstacles)), len(obstacles))
+        bounds = frame_gaps(pad_polygons(parts)[part], pad_polygons(obstacles)[obstacle])
+        distances = np.array([gjk_distance(ConvexShape(parts[p]), shapes[o]).distance for p, o in zip(part, obstacle)])
+        assert (bounds <= np.maximum(distances, 0) + 1e-12).all()
+        parts = [ConvexShape(p) for p in parts]
+        assert GJKCache().clearance(parts, shapes, (part, obstacle), bounds) == pytest.approx(distances.min(), abs=1e-12)
+        stopped = GJKCache().clearance(parts, shapes, (part, obstacle), bounds, stop=0.5)
+        assert stopped <= 0.5 if distances.min() <= 0.5 else stopped == pytest.approx(distances.min(), abs=1e-12)
@@ -0,0 +1,14 @@
+import instrumentation
+from collision_checking import check_many
+
+def bump(times):
+    for _ in range(times):
+        instrumentation.count('bumps')
+        instrumentation.stop('bump', instrumentation.start())
+
+# Counts made from check_many's worker threads are not lost
+def test_concurrent_counts():
+    with instrumentation.profile() as stats:
+        check_many(bump, [(20000,)] * 8, workers=8)
+    assert stats['counters']['bumps'] == 8 * 20000
+    assert stats['timings']['bump']['calls'] == 8 * 20000
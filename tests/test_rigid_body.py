@@ -0,0 +1,39 @@
+import numpy as np
+from rigid_body import CObstacleMap, points_in_polygons
+
+def test_c_obstacle_map_matches_brute_force():
+    rng = np.random.default_rng(0)
+    obstacles = []
+    for _ in range(30):
+        angles = np.sort(rng.uniform(0, 2 * np.pi, rng.integers(3, 8)))
+        obstacles.append(rng.uniform(0, 2, 2) + rng.uniform(0.02, 0.15) * np.stack([np.cos(angles), np.sin(angles)], axis=1))
+    cmap = CObstacleMap(obstacles, 0.2, 0.1, np.arange(0, 360, 30))
+    x, y, angle = rng.uniform(0, 2, 3000), rng.uniform(0, 2, 3000), rng.uniform(0, 360, 3000)
+    slices = cmap.slice_index(angle)
+    points = np.stack([x, y], axis=1)
+    expected = np.array([points_in_polygons(np.repeat(p[None], len(obstacles), axis=0), cmap.polygons[s]).any()
+                         for p, s in zip(points, slices)])
+    np.testing.assert_array_equal(cmap.collides(x, y, angle), expected)
+    assert expected.any() and not expected.all()
+
+class Key:
+    def __init__(self, key):
+        self.key = key
+
+# Pressing into a wall again is answered from the controller's collision cache
+def test_car_controller_uses_collision_cache():
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from matplotlib.patches import Rectangle
+    from rigid_body import CarController
+    fig, ax = plt.subplots()
+    car = Rectangle((0.798, 1.0), 0.2, 0.1)
+    ax.add_patch(car)
+    controller = CarController(ax, car, [np.array([[1.0, 0.9], [1.3, 0.9], [1.3, 1.3], [1.0, 1.3]])])
+    cache = controller.enable_collision_cache()
+    for _ in range(2):
+        controller.on_key_press(Key('up'))
+        assert car.get_x() == 0.798
+    assert (cache.misses, cache.hits) == (1, 1)
+    plt.close(fig)
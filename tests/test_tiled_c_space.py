@@ -0,0 +1,12 @@
+import numpy as np
+from c_space import car_c_space_grid, car_grid_axes
+from tiled_c_space import build_c_space_tiled, car_job
+
+def test_resume_rejects_different_obstacles(tmp_path):
+    filename = str(tmp_path / 'grid.npy')
+    job = car_job(0.2, 0.1, resolution=16)
+    first = [np.array([[0.5, 0.5], [0.9, 0.5], [0.7, 0.9]])]
+    second = [np.array([[1.2, 1.2], [1.6, 1.2], [1.4, 1.6]])]
+    build_c_space_tiled(job, first, filename, tile_shape=(8, 8, 8), workers=1)
+    grid = build_c_space_tiled(job, second, filename, tile_shape=(8, 8, 8), workers=1)
+    np.testing.assert_array_equal(grid, car_c_space_grid(*car_grid_axes(16), 0.2, 0.1, second))
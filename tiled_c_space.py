@@ -0,0 +1,121 @@
+import json
+import os
+import itertools
+import numpy as np
+from numpy import pi
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from collision_checking import pad_polygons
+from c_space import ObstacleSet, arm_grid_axes, arm_c_space_grid, car_grid_axes, car_c_space_grid
+from scene_store import obstacle_digests
+
+# Tiled, multi-process c-space builder.
+# The configuration grid is split into tiles that a process pool computes independently. Every worker writes
+# its tile straight into a uint8 .npy occupancy file opened as a memory map, so the full grid never has to fit
+# in RAM. A second small memory-mapped file (<filename>.tiles.npy) records finished tiles, and <filename>.json
+# records the job, the grid resolution, the robot geometry and a digest of every obstacle, so an interrupted run
+# resumes where it stopped only when called again with the same job and the same obstacles.
+
+ARM_GEOMETRY = ('joint1', 'rad', 'rwid', 'rlen1', 'rlen2')
+
+# Job description for the arm's (theta1, theta2) c-space, with the arm's geometry copied out of the controller
+def arm_job(arm, resolution=100, theta1_range=(-pi, pi), theta2_range=(-pi, pi)):
+    axes = arm_grid_axes(resolution, theta1_range, theta2_range)
+    geometry = {name: np.asarray(getattr(arm, name), dtype=float).tolist() for name in ARM_GEOMETRY}
+    return {'kind': 'arm', 'axes': [a.tolist() for a in axes], 'geometry': geometry}
+
+# Job description for the car's (x, y, angle) c-space, angles in degrees
+def car_job(width, height, resolution=50, x_range=(0, 2), y_range=(0, 2), angle_range=(0, 360), bounds=(0, 2, 0, 2)):
+    axes = car_grid_axes(resolution, x_range, y_range, angle_range)
+    geometry = {'width': width, 'height': height, 'bounds': list(bounds)}
+    return {'kind': 'car', 'axes': [a.tolist() for a in axes], 'geometry': geometry}
+
+# A stand-in arm controller with the geometry recorded in an arm job
+def job_arm(job):
+    from planar_arm import Arm_Controller
+    arm = Arm_Controller(0, 0, None)
+    for name, value in job['geometry'].items():
+        setattr(arm, name, tuple(value) if isinstance(value, list) else value)
+    return arm
+
+# Slices of every tile in the grid, in C order
+def tile_slices(shape, tile_shape):
+    ranges = [range(0, n, t) for n, t in zip(shape, tile_shape)]
+    return [tuple(slice(s, min(s + t, n)) for s, t, n in zip(starts, tile_shape, shape))
+            for starts in itertools.product(*ranges)]
+
+# Per-worker state, set up once by init_worker so obstacles aren't re-sent with every tile
+worker_state = {}
+
+def init_worker(job, padded_obstacles, filename):
+    worker_state['job'] = job
+    worker_state['axes'] = [np.asarray(a) for a in job['axes']]
+    worker_state['obstacles'] = ObstacleSet(padded_obstacles)
+    worker_state['grid'] = np.load(filename, mmap_mode='r+')
+    if job['kind'] == 'arm':
+        worker_state['arm'] = job_arm(job)
+
+def compute_tile(tile_id, slices):
+    job, obstacles = worker_state['job'], worker_state['obstacles']
+    axes = [a[s] for a, s in zip(worker_state['axes'], slices)]
+    if job['kind'] == 'arm':
+        tile = arm_c_space_grid(worker_state['arm'], axes[0], axes[1], obstacles)
+    else:
+        g = job['geometry']
+        tile = car_c_space_grid(*axes, g['width'], g['height'], obstacles, tuple(g['bounds']))
+    grid = worker_state['grid']
+    grid[slices] = tile
+    grid.flush()
+    return tile_id
+
+# Opens the occupancy and tile-progress files, creating them unless a matching earlier run can be resumed.
+# Any mismatch (job, resolution, robot, obstacles or tiling) starts over with fresh files
+def open_grid(job, obstacles, filename, tile_shape):
+    shape = tuple(len(a) for a in job['axes'])
+    meta = {'job': job, 'resolution': list(shape), 'robot': job['geometry'],
+            'obstacles': obstacle_digests(obstacles), 'tile_shape': list(tile_shape)}
+    meta_file, tiles_file = filename + '.json', filename + '.tiles.npy'
+    num_tiles = len(tile_slices(shape, tile_shape))
+    if os.path.exists(meta_file) and os.path.exists(filename) and os.path.exists(tiles_file):
+        with open(meta_file) as f:
+            if json.load(f) == meta:
+                return np.load(tiles_file, mmap_mode='r+')
+    if os.path.exists(tiles_file): os.remove(tiles_file)
+    np.lib.format.open_memmap(filename, mode='w+', dtype=np.uint8, shape=shape).flush()
+    tiles = np.lib.format.open_memmap(tiles_file, mode='w+', dtype=np.uint8, shape=(num_tiles,))
+    tiles.flush()
+    with open(meta_file, 'w') as f:
+        json.dump(meta, f)
+    return tiles
+
+# Runs (or resumes) a job produced by arm_job/car_job and returns the occupancy grid as a read-only memory map.
+# progress(done_tiles, total_tiles) is called after every finished tile; workers=1 computes in this process
+def build_c_space_tiled(job, obstacles, filename, tile_shape=None, workers=None, progress=None):
+    filename = os.fspath(filename)
+    if not filename.endswith('.npy'): filename += '.npy'
+    shape = tuple(len(a) for a in job['axes'])
+    tile_shape = tuple(tile_shape) if tile_shape is not None else (256, 256) + (16,) * (len(shape) - 2)
+    tiles = open_grid(job, obstacles, filename, tile_shape)
+    slices = tile_slices(shape, tile_shape)
+    todo = [i for i in range(len(slices)) if not tiles[i]]
+    done = len(slices) - len(todo)
+    padded = pad_polygons(obstacles) if len(obstacles) else np.empty((0, 1, 2))
+
+    def finish(tile_id):
+        nonlocal done
+        tiles[tile_id] = 1
+        tiles.flush()
+        done += 1
+        if progress is not None: progress(done, len(slices))
+
+    if workers == 1:
+        init_worker(job, padded, filename)
+        for i in todo:
+            finish(compute_tile(i, slices[i]))
+        worker_state.clear()
+    elif todo:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                 initargs=(job, padded, filename)) as pool:
+            futures = [pool.submit(compute_tile, i, slices[i]) for i in todo]
+            for future in as_completed(futures):
+                finish(future.result())
+    return np.load(filename, mmap_mode='r')